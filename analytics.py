@@ -0,0 +1,196 @@
+"""Data and analytics core behind app.py.
+
+Plain pandas, no Streamlit: the schedule built from the exercise bank, the
+typed history frame and its per-exercise index, the per-day rollup behind the
+Calendar and Progression tabs, and today's session summary. app.py wraps
+these in its caches; bench.py and anything else can call them directly.
+"""
+import numpy as np
+import pandas as pd
+
+from storage import LOG_COLUMNS
+
+# Progression chart metric -> (rollup column, bucket by week)
+CHART_METRICS = {
+    'Daily volume': ('Volume', False),
+    'Top set (kg)': ('Top Kg', False),
+    'Est 1RM': ('Est 1RM', False),
+    'Weekly volume': ('Volume', True),
+}
+# Most points a chart is sent; longer series are downsampled
+MAX_CHART_POINTS = 365
+
+
+# --- EXERCISE BANK ---
+def format_youtube_url(url):
+    if not isinstance(url, str): return url
+    if "/shorts/" in url: return url.replace("/shorts/", "/watch?v=")
+    return url
+
+
+def build_schedule(bank):
+    # day -> [ {group, exercises (bank order), core, status, videos} ]
+    # so the cards never filter a DataFrame.
+    schedule = {}
+    for day, day_rows in bank.groupby('Day', sort=False):
+        groups = []
+        for group, rows in day_rows.groupby('Target Group', sort=False):
+            exercises = rows['Exercise'].tolist()
+            status = dict(zip(exercises, rows['Status'].fillna('').astype(str).str.strip()))
+            core = [ex for ex in exercises if status[ex].lower() == 'core']
+            videos = {}
+            for ex, video in zip(exercises, rows['Video Link']):
+                if pd.notna(video) and str(video).strip():
+                    videos[ex] = format_youtube_url(str(video).strip())
+            groups.append({
+                'group': group,
+                'exercises': exercises,
+                'core': core[0] if core else exercises[0],
+                'status': status,
+                'videos': videos,
+            })
+        schedule[day] = groups
+    return schedule
+
+
+# --- HISTORY ---
+def history_frame(raw_logs):
+    # Typed, compact copy of the raw log: categorical Exercise, float32/int16
+    # numbers and a date-only Day column so day filters compare datetime64
+    # instead of objects.
+    df = pd.DataFrame({
+        'ID': raw_logs['ID'],
+        'Date': pd.to_datetime(raw_logs['Date']),
+        'Exercise': raw_logs['Exercise'].astype('category'),
+        'Weight': pd.to_numeric(raw_logs['Weight'], errors='coerce').fillna(0).astype('float32'),
+        'Reps': pd.to_numeric(raw_logs['Reps'], errors='coerce').fillna(0).astype('int16'),
+    })
+    df['Volume'] = df['Weight'] * df['Reps']
+    df['Day'] = df['Date'].dt.normalize()
+    return df
+
+
+def history_index(history_df):
+    # exercise -> index labels of its last 3 rows, newest first, so the
+    # cards' Edit tab is a dict hit. Targets come from recommend.Recommender.
+    if history_df.empty:
+        return {}
+    ordered = history_df.sort_values(by='Date', kind='stable')
+    recent = ordered.groupby('Exercise', observed=True).tail(3)
+    return {exercise: rows.index[::-1].to_numpy()
+            for exercise, rows in recent.groupby('Exercise', sort=False, observed=True)}
+
+
+def recent_logs(history_df, index, exercise):
+    labels = index.get(exercise)
+    return history_df.loc[labels] if labels is not None else history_df.iloc[0:0]
+
+
+def daily_rollup(history_df):
+    # Per (day, exercise) rollup shared by the Calendar and Progression tabs,
+    # stored twice (day-first and exercise-first) so both hit a sorted index.
+    if history_df.empty:
+        return None
+    df = history_df.assign(E1RM=history_df['Weight'] * (1 + history_df['Reps'] / 30))
+    # Sorting by load puts each day's top set last in its group
+    df = df.sort_values(by=['Day', 'Weight', 'Reps'], kind='stable')
+    g = df.groupby(['Day', 'Exercise'], observed=True)
+    by_day = pd.DataFrame({
+        'Sets': g.size(),
+        'Top Kg': g['Weight'].last(),
+        'Top Reps': g['Reps'].last(),
+        'Volume': g['Volume'].sum(),
+        'Est 1RM': g['E1RM'].max(),
+    }).sort_index()
+    by_exercise = by_day.swaplevel().sort_index()
+    return {
+        'by_day': by_day,
+        'by_exercise': by_exercise,
+        'exercises': sorted(by_exercise.index.get_level_values(0).unique()),
+        'first_day': by_day.index[0][0].date(),
+        # chart_series() memo, lives and dies with this rollup's log version
+        'charts': {},
+    }
+
+
+def day_summary(rollup, day):
+    # One row per exercise trained on `day`, or None
+    day = pd.Timestamp(day)
+    by_day = rollup['by_day']
+    return by_day.loc[day].reset_index() if day in by_day.index.levels[0] else None
+
+
+def exercise_series(rollup, exercise, column='Volume'):
+    # Per-day values of one rollup column for one exercise
+    return rollup['by_exercise'].loc[exercise][column]
+
+
+def lttb(series, n):
+    # Largest-Triangle-Three-Buckets: keeps the first and last points and,
+    # per bucket, the point spanning the largest triangle with its
+    # neighbours, so peaks and dips survive the downsampling.
+    if n < 3 or len(series) <= n:
+        return series
+    x = ((series.index - series.index[0]) / pd.Timedelta(days=1)).to_numpy(dtype=float)
+    y = series.to_numpy(dtype=float)
+    size = (len(y) - 2) / (n - 2)
+    keep, a = [0], 0
+    for i in range(n - 2):
+        start, end = int(i * size) + 1, int((i + 1) * size) + 1
+        next_end = min(int((i + 2) * size) + 1, len(y))
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep.append(a)
+    keep.append(len(y) - 1)
+    return series.iloc[keep]
+
+
+def chart_series(rollup, exercise, metric, max_points=MAX_CHART_POINTS):
+    # One progression line, at most max_points long, memoized on the rollup
+    key = (exercise, metric, max_points)
+    cached = rollup['charts'].get(key)
+    if cached is None:
+        column, weekly = CHART_METRICS[metric]
+        series = exercise_series(rollup, exercise, column).astype(float)
+        if weekly:
+            # Weeks trained only, so gaps don't read as zero volume
+            series = series.groupby(series.index.to_period('W').start_time).sum()
+        cached = rollup['charts'][key] = lttb(series, max_points).rename(metric)
+    return cached
+
+
+# --- TODAY'S SESSION ---
+def today_session(buffer_rows, store_rows):
+    # Union of the session buffer and whatever the store holds for today
+    # (other devices), de-duplicated on the stable log ID.
+    df = pd.concat([pd.DataFrame(buffer_rows, columns=LOG_COLUMNS), store_rows[LOG_COLUMNS]], ignore_index=True)
+    if df.empty:
+        return df
+    df['Date'] = df['Date'].astype(str)
+    df['Weight'] = pd.to_numeric(df['Weight'], errors='coerce').fillna(0).astype(float)
+    df['Reps'] = pd.to_numeric(df['Reps'], errors='coerce').fillna(0).astype(int)
+    # Same ID in both: the store's copy wins (it has any later edits)
+    return df.drop_duplicates(subset='ID', keep='last').sort_values(by='Date', kind='stable')
+
+
+def summary_html(today_logs):
+    # HTML table for the workout summary email
+    html_table = """
+    <table style="border-collapse: collapse; width: 100%; border: 1px solid #ddd; font-family: Arial, sans-serif;">
+        <tr style="background-color: #D81B60; color: white;">
+            <th style="padding: 10px; border: 1px solid #ddd;">Exercise</th>
+            <th style="padding: 10px; border: 1px solid #ddd;">Weight (kg)</th>
+            <th style="padding: 10px; border: 1px solid #ddd;">Reps</th>
+        </tr>
+    """
+    for _, row in today_logs.iterrows():
+        html_table += f"""
+        <tr>
+            <td style="padding: 8px; border: 1px solid #ddd;">{row['Exercise']}</td>
+            <td style="padding: 8px; border: 1px solid #ddd; text-align: center;">{row['Weight']}</td>
+            <td style="padding: 8px; border: 1px solid #ddd; text-align: center;">{row['Reps']}</td>
+        </tr>
+        """
+    html_table += "</table>"
+    return html_table
@@ -2,64 +2,280 @@ import streamlit as st
 from streamlit_gsheets import GSheetsConnection
 import pandas as pd
 from datetime import datetime
-import time
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import os
+import re
+import analytics
+import timing
+from archive import Archiver
+from assets import build_variants, logo_html
+from fetch import FetchCoordinator
+from journal import Journal
+from log_cache import LogCache
+from mailer import FAILED, SENT, Mailer
+from recommend import Recommender
+from snapshot import RefreshingValue
+from storage import BANK_CSV, LOG_COLUMNS, empty_logs, make_store, new_log_id, user_data_dir
 
 # --- CONFIG ---
 st.set_page_config(page_title="Pippafit 65", page_icon="💪")
-SHEET_URL = st.secrets["connections"]["gsheets"]["spreadsheet"]
+# The log and everything derived from it are shared by all sessions; with
+# copy-on-write (always on from pandas 3) a session can't mutate them
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+try:
+    SHEET_URL = st.secrets["connections"]["gsheets"]["spreadsheet"]
+except (KeyError, FileNotFoundError):
+    SHEET_URL = None
+# "gsheets" (default when a sheet is configured), or "sqlite" / "csv" to run
+# offline from PIPPAFIT_DATA_DIR
+STORAGE = os.environ.get("PIPPAFIT_STORAGE", "gsheets" if SHEET_URL else "sqlite")
+DATA_DIR = os.environ.get("PIPPAFIT_DATA_DIR", ".pippafit")
+# With Sheets, first paint comes from local snapshots and the remote copy is
+# swapped in when it arrives (PIPPAFIT_BOOTSTRAP=0 to wait for it instead)
+BOOTSTRAP = STORAGE == "gsheets" and os.environ.get("PIPPAFIT_BOOTSTRAP", "1") != "0"
+# Move past years out of the hot log in the background (PIPPAFIT_ARCHIVE=0
+# to leave the log as it is)
+ARCHIVE = os.environ.get("PIPPAFIT_ARCHIVE", "1") != "0"
+# Sheets requests per minute across all sessions (the API allows 60 per user)
+SHEETS_PER_MINUTE = int(os.environ.get("PIPPAFIT_SHEETS_PER_MINUTE", "50"))
+# Optional JSON-lines file for per-stage timings; add ?diag=1 to the URL for the panel
+timing.configure(os.environ.get("PIPPAFIT_TIMING_LOG"))
+# Athletes: [users.<id>] in secrets, each with a name and the email their
+# workout summaries go to. Exactly one has legacy_log = true and keeps the
+# original log; every other one gets a log of its own (see
+# storage.make_store). Without [users] the app has one athlete, as before.
+try:
+    USERS = {uid: dict(cfg) for uid, cfg in st.secrets["users"].items()}
+except (KeyError, FileNotFoundError):
+    USERS = {}
+USERS = USERS or {"me": {"legacy_log": True}}
+for uid in USERS:
+    # IDs end up in worksheet and folder names
+    if not re.fullmatch(r"[a-z][a-z0-9_-]*", uid):
+        st.error(f"Invalid user ID '{uid}' in secrets: use lowercase letters, digits, - and _")
+        st.stop()
+LEGACY_USERS = [uid for uid, cfg in USERS.items() if cfg.get("legacy_log") is True]
+if len(LEGACY_USERS) != 1:
+    st.error(f"Exactly one athlete under [users] needs legacy_log = true (found {len(LEGACY_USERS)})")
+    st.stop()
+LEGACY_USER = LEGACY_USERS[0]
+
+def storage_user(user):
+    return None if user == LEGACY_USER else user
+
+def user_dir(user):
+    # Journal and snapshots sit next to that athlete's local data
+    return user_data_dir(DATA_DIR, storage_user(user))
 
 # --- EMAIL FUNCTION ---
+@st.cache_resource
+def get_mailer():
+    cfg = st.secrets["email"]
+    return Mailer(
+        cfg["smtp_server"],
+        cfg["smtp_port"],
+        cfg["sender_email"],
+        password=cfg.get("sender_password"),
+        starttls=cfg.get("starttls", True),
+        on_done=lambda job: timing.record("email_send", job['seconds'], status=job['status']),
+    )
+
 def send_workout_email(summary_html):
+    # Queues the summary and returns straight away; delivery happens on the
+    # mailer's worker thread.
     try:
-        # Load secrets
-        smtp_server = st.secrets["email"]["smtp_server"]
-        smtp_port = st.secrets["email"]["smtp_port"]
-        sender_email = st.secrets["email"]["sender_email"]
-        sender_password = st.secrets["email"]["sender_password"]
-        receiver_email = st.secrets["email"]["receiver_email"]
-
-        # Create Message
-        msg = MIMEMultipart()
-        msg['From'] = "Pippafit App <" + sender_email + ">"
-        msg['To'] = receiver_email
-        msg['Subject'] = f"💪 Workout Complete: {datetime.now().strftime('%A, %d %b')}"
-
-        # Attach HTML body
-        msg.attach(MIMEText(summary_html, 'html'))
-
-        # Send
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.send_message(msg)
-        server.quit()
-        return True
+        subject = f"💪 Workout Complete: {datetime.now().strftime('%A, %d %b')}"
+        receiver = USERS[USER].get("email") or st.secrets["email"]["receiver_email"]
+        return get_mailer().send(receiver, subject, summary_html)
     except Exception as e:
         st.error(f"Email Error: {e}")
-        return False
+        return None
+
+@st.fragment(run_every=2)
+def email_status(job_id):
+    status = get_mailer().status(job_id)
+    if status['status'] in (SENT, FAILED):
+        # Done: one full rerun renders the final state without this poller
+        st.rerun()
+    st.caption("📧 Sending summary email...")
+
+# --- STORAGE ---
+# Everything below is per athlete (cached per user ID), so a page only ever
+# touches its own athlete's log, caches and indexes.
+@st.cache_resource
+def get_coordinator():
+    # One Sheets budget per process: all athletes share the API quota
+    return FetchCoordinator(per_minute=SHEETS_PER_MINUTE)
+
+@st.cache_resource
+def get_store(user):
+    conn = st.connection("gsheets", type=GSheetsConnection) if STORAGE == "gsheets" else None
+    return make_store(STORAGE, data_dir=DATA_DIR, conn=conn, spreadsheet=SHEET_URL, coordinator=get_coordinator(), user=storage_user(user))
+
+@st.cache_resource
+def get_journal(user):
+    cache, store = get_log_cache(user), get_store(user)
+
+    def flush(rows):
+        with timing.stage("sync", rows=len(rows)):
+            cache.append(rows)
+
+    return Journal(os.path.join(user_dir(user), "journal.db"), flush, store.existing_ids)
+
+@st.fragment(run_every=2)
+def sync_status(pending):
+    # Polls while sets are waiting in the journal; a full rerun once they're
+    # through so every card and the history pick them up.
+    journal = get_journal(USER)
+    now_pending = sum(journal.pending_counts().values())
+    if now_pending < pending:
+        st.rerun()
+    if journal.last_error:
+        st.caption(f"⚠️ Offline: {now_pending} set(s) kept on this device, retrying ({journal.last_error})")
+    else:
+        st.caption(f"⏳ Syncing {now_pending} set(s)...")
 
 # --- CACHED DATA LOADING ---
-@st.cache_data(ttl=600)
+@st.cache_resource
+def get_bank(user):
+    # Exercise_bank, refreshed in the background every 600s. Shared sheet,
+    # but read through the athlete's store: it comes in the same request as
+    # their log.
+    store = get_store(user)
+    if BOOTSTRAP:
+        return RefreshingValue(store.read_movements, lambda: pd.read_csv(BANK_CSV), snapshot_path=os.path.join(user_dir(user), "bank_snapshot.csv"),
+                               name="get_movements_data")
+    return RefreshingValue(store.read_movements, name="get_movements_data")
+
 def get_movements_data():
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    return conn.read(spreadsheet=SHEET_URL, worksheet="Exercise_bank")
+    return get_bank(USER).get()
+
+@st.cache_resource
+def get_log_cache(user):
+    return LogCache(get_store(user), snapshot_path=os.path.join(user_dir(user), "logs_snapshot.csv") if BOOTSTRAP else None,
+                    name="get_logs_data")
+
+# --- ARCHIVE ---
+# The log holds recent years only; older ones are archived into yearly
+# partitions plus a per-exercise summary (see archive.py)
+@st.cache_resource
+def get_summary(user):
+    store = get_store(user)
+    if BOOTSTRAP:
+        return RefreshingValue(store.read_summary, lambda: None, snapshot_path=os.path.join(user_dir(user), "summary_snapshot.csv"))
+    return RefreshingValue(store.read_summary)
+
+@st.cache_resource
+def get_archiver(user):
+    return Archiver(get_store(user))
+
+@st.cache_resource
+def get_recommender(user):
+    # Starts from the archive summary, kept current by the log cache as sets come in
+    version, summary = get_summary(user).get()
+    recommender = Recommender()
+    recommender.seed(summary, version)
+    get_log_cache(user).subscribe(recommender)
+    return recommender
+
+def sync_summary():
+    # A newer summary (archive run, background refresh) re-seeds the recommender
+    version, summary = get_summary(USER).get()
+    recommender = get_recommender(USER)
+    if recommender.seed_version != version:
+        recommender.seed(summary, version)
+        get_log_cache(USER).reset_listeners()
+
+def start_archival(raw_logs):
+    # Past years leave the hot log in the background, then the summary and
+    # the (smaller) log are reloaded
+    if not ARCHIVE or raw_logs.empty or get_log_cache(USER).stale:
+        return
+    summary, cache = get_summary(USER), get_log_cache(USER)
+
+    def done(moved):
+        summary.refresh()
+        cache.invalidate()
+
+    get_archiver(USER).maybe_run(raw_logs['Date'].iat[0], done)
+
+@st.cache_resource(max_entries=len(USERS))
+def get_archived_logs(user, archive_version):
+    # Cold partitions, read only when the history tabs ask for them
+    store = get_store(user)
+    parts = [store.read_partition(year) for year in store.partitions()]
+    return pd.concat(parts, ignore_index=True) if parts else empty_logs()
+
+@st.cache_resource(max_entries=2 * len(USERS))
+def get_full_rollup(user, archive_version, logs_version, _raw_logs):
+    archived = get_archived_logs(user, archive_version)
+    full = pd.concat([archived[LOG_COLUMNS].astype(object), _raw_logs[LOG_COLUMNS].astype(object)], ignore_index=True)
+    return analytics.daily_rollup(analytics.history_frame(full))
 
-@st.cache_data(ttl=10)
 def get_logs_data():
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    df = conn.read(spreadsheet=SHEET_URL, worksheet="Logs", usecols=[0, 1, 2, 3])
-    if df.empty:
-        return pd.DataFrame(columns=['Date', 'Exercise', 'Weight', 'Reps'])
-    return df
+    return get_log_cache(USER).snapshot()
+
+# Derived history, built once per athlete and log version and shared
+# read-only by every rerun (see analytics.py)
+@st.cache_resource(max_entries=4 * len(USERS))
+def get_history_frame(user, version, _raw_logs):
+    return analytics.history_frame(_raw_logs)
+
+@st.cache_resource(max_entries=4 * len(USERS))
+def get_history_index(user, version, _history_df):
+    return analytics.history_index(_history_df)
+
+@st.cache_resource(max_entries=4 * len(USERS))
+def get_daily_rollup(user, version, _history_df):
+    return analytics.daily_rollup(_history_df)
 
 # --- HELPERS ---
-def format_youtube_url(url):
-    if not isinstance(url, str): return url
-    if "/shorts/" in url: return url.replace("/shorts/", "/watch?v=")
-    return url
+@st.cache_resource
+def get_logo_html():
+    # Resized copies are written to ./static once per source hash and served
+    # by Streamlit's static file serving (see .streamlit/config.toml)
+    return logo_html(build_variants("pippafit_65.png"), build_variants("Pippafit_Dark.png"))
+
+# Exercise_bank compiled once per bank copy and version
+@st.cache_resource(max_entries=2 * len(USERS))
+def get_schedule(user, version, _bank):
+    return analytics.build_schedule(_bank)
+
+# --- TODAY'S SESSION BUFFER ---
+# Sets saved from this browser today, kept in session state so "Complete
+# workout" doesn't need to download the log to find them.
+def session_rows():
+    today = datetime.now().strftime('%Y-%m-%d')
+    buf = st.session_state.get('session_log')
+    if not buf or buf['date'] != today:
+        buf = st.session_state.session_log = {'date': today, 'rows': []}
+    return buf['rows']
+
+# --- SAVING SETS ---
+def collect_sets(exercise):
+    # Sets with reps become log rows (as SAVE SETS always did); also reports
+    # whether the card has weights typed in but no reps anywhere.
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows, has_weight = [], False
+    for i in range(1, 4):
+        w = st.session_state.get(f"{exercise}_w{i}")
+        r = st.session_state.get(f"{exercise}_r{i}")
+        has_weight = has_weight or w is not None
+        if r:
+            rows.append({"Date": now, "Exercise": exercise, "Weight": w or 0, "Reps": r, "ID": new_log_id()})
+    return rows, has_weight and not rows
+
+def commit_sets(rows):
+    # Committed to the local journal instantly; the flusher syncs everything
+    # pending in one batched append, however many cards it came from
+    with timing.stage("save", rows=len(rows)):
+        get_journal(USER).add(rows)
+    session_rows().extend(rows)
+    # Clear the saved inputs so a later "Save all" can't log them twice
+    for exercise in {r['Exercise'] for r in rows}:
+        for i in range(1, 4):
+            st.session_state.pop(f"{exercise}_w{i}", None)
+            st.session_state.pop(f"{exercise}_r{i}", None)
 
 # --- CUSTOM CSS ---
 hide_st_style = """
@@ -69,6 +285,9 @@ hide_st_style = """
     footer {visibility: hidden;}
     [data-testid="stToolbar"] {visibility: hidden !important; display: none !important;}
     .block-container {padding-top: 2rem;}
+
+    .logo-container { display: flex; justify-content: center; }
+    .logo-container img { width: 250px; max-width: 100%; height: auto; }
     
     div.stButton > button[kind="primary"] {
         background-color: #D81B60 !important;
@@ -156,33 +375,124 @@ def update_weights(ex_key):
         if st.session_state.get(w2_key) is None: st.session_state[w2_key] = val_w1
         if st.session_state.get(w3_key) is None: st.session_state[w3_key] = val_w1
 
+# --- SWAP CALLBACKS ---
+def set_swapping(swap_key, value):
+    st.session_state[swap_key] = value
+
+def pick_exercise(anchor_key, swap_key, select_key):
+    st.session_state[anchor_key] = st.session_state[select_key]
+    st.session_state[swap_key] = False
+
+# --- EDIT CALLBACK ---
+def save_log_edit(log_id):
+    weight = st.session_state.get(f"editw_{log_id}")
+    reps = st.session_state.get(f"editr_{log_id}")
+    if weight is None or reps is None:
+        return
+    try:
+        with timing.stage("edit"):
+            get_log_cache(USER).update(log_id, weight, reps)
+    except KeyError:
+        st.toast("That entry was removed on another device.", icon="⚠️")
+        return
+    for r in session_rows():
+        if r['ID'] == log_id:
+            r.update(Weight=weight, Reps=reps)
+    # st.rerun() isn't allowed in callbacks; the card asks for it instead
+    st.session_state.log_edited = True
+
+# --- ATHLETE ---
+def signed_in_user():
+    # st.login() identity (when auth is configured), matched on email
+    try:
+        email = st.user.email if st.user.is_logged_in else None
+    except Exception:
+        return None
+    return next((uid for uid, cfg in USERS.items() if email and cfg.get("email") == email), None)
+
+def pick_user():
+    # Signed-in athlete, else ?user=<id> (a bookmark, not access control),
+    # else ask
+    if len(USERS) == 1:
+        return LEGACY_USER
+    user = signed_in_user() or st.query_params.get("user")
+    if user in USERS:
+        return user
+    choice = st.selectbox("Who's training?", list(USERS), index=None, format_func=lambda u: USERS[u].get("name", u))
+    if choice is None:
+        st.stop()
+    st.query_params["user"] = choice
+    st.rerun()
+
+def switch_user():
+    st.query_params.pop("user", None)
+
+USER = pick_user()
+# Inputs, swaps and today's buffer belong to one athlete: start clean on a switch
+if st.session_state.get("athlete") != USER:
+    for key in list(st.session_state):
+        del st.session_state[key]
+    st.session_state.athlete = USER
+
 # --- LOAD DATA ---
+def load_history():
+    # Shared by the full run and every fragment rerun; on a warm cache this
+    # is a version check plus three cached lookups.
+    with timing.stage("data_load"):
+        sync_summary()
+        logs_version, raw_logs = get_logs_data()
+    # Pre-processing for History/Graph (cached per log version)
+    with timing.stage("preprocess"):
+        history_df = get_history_frame(USER, logs_version, raw_logs)
+        history_index = get_history_index(USER, logs_version, history_df)
+        daily_rollup = get_daily_rollup(USER, logs_version, history_df)
+    return raw_logs, history_df, history_index, daily_rollup, logs_version
+
 try:
-    movements_db = get_movements_data()
-    history_df = get_logs_data()
-    
-    # Pre-processing for History/Graph
-    if not history_df.empty:
-        # Ensure Date is datetime object
-        history_df['Date'] = pd.to_datetime(history_df['Date'])
-        # Ensure numerics
-        history_df['Weight'] = pd.to_numeric(history_df['Weight'], errors='coerce').fillna(0)
-        history_df['Reps'] = pd.to_numeric(history_df['Reps'], errors='coerce').fillna(0)
-        # Calculate Volume
-        history_df['Volume'] = history_df['Weight'] * history_df['Reps']
+    schedule = get_schedule(USER, *get_movements_data())
+    # Warm the log caches up front so a connection error stops the page here
+    start_archival(load_history()[0])
         
 except Exception as e:
     st.error(f"Connection Error: {e}")
     st.stop()
 
+# --- REMOTE REFRESH (bootstrap mode) ---
+@st.fragment(run_every=2)
+def remote_refresh_status():
+    bank, logs = get_bank(USER), get_log_cache(USER)
+    if bank.ready and not logs.stale:
+        # Remote copy is in: one full rerun swaps it into every card
+        st.rerun()
+    error = logs.error or bank.error
+    if error:
+        st.caption(f"⚠️ Showing the copy saved on this device; Google Sheets is unreachable ({error})")
+    else:
+        st.caption("🔄 Showing the copy saved on this device, refreshing from Google Sheets...")
+
+if BOOTSTRAP and not (get_bank(USER).ready and not get_log_cache(USER).stale):
+    remote_refresh_status()
+elif get_log_cache(USER).error:
+    # Lost the store after loading: keep going on the copy we have
+    st.caption(f"⚠️ Showing the log as of the last sync; the store is unreachable ({get_log_cache(USER).error})")
+
 # --- UI HEADER ---
 # Using columns to center the image reliably
 c1, c2, c3 = st.columns([1, 2, 1])
 with c2:
     try:
-        st.image("pippafit_65.png", width=250)
+        st.markdown(get_logo_html(), unsafe_allow_html=True)
     except Exception:
-        st.error("Logo file 'pippafit_65.png' not found.")
+        try:
+            st.image("pippafit_65.png", width=250)
+        except Exception:
+            st.error("Logo file 'pippafit_65.png' not found.")
+
+if len(USERS) > 1:
+    c1, c2 = st.columns([3, 1])
+    c1.caption(f"Training as **{USERS[USER].get('name', USER)}**")
+    if not signed_in_user():
+        c2.button("Switch", key="switch_user", on_click=switch_user)
 
 # --- DAY SELECTION ---
 days = ["Monday", "Wednesday", "Saturday"]
@@ -206,245 +516,296 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# --- WORKOUT SPREAD ---
-day_data = movements_db[movements_db['Day'] == st.session_state.selected_day]
+# --- MUSCLE CARD ---
+# Each card is a fragment: typing a weight or swapping an exercise reruns
+# only that card. History comes from the shared caches, not the full run.
+@st.fragment
+def muscle_card(group):
+    if st.session_state.pop("log_edited", False):
+        # Full rerun after an edit, as after SAVE SETS and ❌, so the
+        # history section picks it up too
+        st.rerun()
+    _, history_df, history_index, _, _ = load_history()
+    muscle = group['group']
+    with st.container(border=True), timing.stage("muscle_card", muscle=muscle):
+        ex_list = group['exercises']
+        
+        anchor_key = f"anchor_{muscle}_{st.session_state.selected_day}"
+        if anchor_key not in st.session_state:
+            st.session_state[anchor_key] = group['core']
+        
+        st.markdown(f'<p class="muscle-header">{muscle}</p>', unsafe_allow_html=True)
+        st.markdown(f'<div class="exercise-title">{st.session_state[anchor_key]}</div>', unsafe_allow_html=True)
+        
+        # --- SWAP INTERACTION ---
+        swap_state_key = f"is_swapping_{muscle}"
+        if swap_state_key not in st.session_state:
+            st.session_state[swap_state_key] = False
+        
+        st.markdown('<div class="swap-trigger-wrapper">', unsafe_allow_html=True)
+        # Callbacks update state before the (fragment) rerun, so no st.rerun needed
+        if not st.session_state[swap_state_key]:
+            st.button("Swap exercise", key=f"btn_swap_{muscle}", on_click=set_swapping, args=(swap_state_key, True))
+        else:
+            select_key = f"sb_{muscle}_{st.session_state.selected_day}"
+            st.selectbox(
+                "Choose alternative:", 
+                ex_list, 
+                index=ex_list.index(st.session_state[anchor_key]),
+                key=select_key,
+                on_change=pick_exercise,
+                args=(anchor_key, swap_state_key, select_key)
+            )
+            st.button("Cancel swap", key=f"cancel_{muscle}", on_click=set_swapping, args=(swap_state_key, False))
+        st.markdown('</div>', unsafe_allow_html=True)
 
-if day_data.empty:
-    st.info(f"No workout scheduled for {st.session_state.selected_day}.")
-else:
-    for muscle in day_data['Target Group'].unique():
-        with st.container(border=True):
-            options = day_data[day_data['Target Group'] == muscle]
-            ex_list = options['Exercise'].tolist()
-            
-            anchor_key = f"anchor_{muscle}_{st.session_state.selected_day}"
-            if anchor_key not in st.session_state:
-                st.session_state[anchor_key] = ex_list[0]
-            
-            st.markdown(f'<p class="muscle-header">{muscle}</p>', unsafe_allow_html=True)
-            st.markdown(f'<div class="exercise-title">{st.session_state[anchor_key]}</div>', unsafe_allow_html=True)
-            
-            # --- SWAP INTERACTION ---
-            swap_state_key = f"is_swapping_{muscle}"
-            if swap_state_key not in st.session_state:
-                st.session_state[swap_state_key] = False
-            
-            st.markdown('<div class="swap-trigger-wrapper">', unsafe_allow_html=True)
-            if not st.session_state[swap_state_key]:
-                if st.button("Swap exercise", key=f"btn_swap_{muscle}"):
-                    st.session_state[swap_state_key] = True
-                    st.rerun()
-            else:
-                selected_ex = st.selectbox(
-                    "Choose alternative:", 
-                    ex_list, 
-                    index=ex_list.index(st.session_state[anchor_key]),
-                    key=f"sb_{muscle}_{st.session_state.selected_day}"
-                )
-                if selected_ex != st.session_state[anchor_key]:
-                    st.session_state[anchor_key] = selected_ex
-                    st.session_state[swap_state_key] = False
-                    st.rerun()
-                if st.button("Cancel swap", key=f"cancel_{muscle}"):
-                    st.session_state[swap_state_key] = False
+        current_exercise = st.session_state[anchor_key]
+        
+        # Watch demo
+        video = group['videos'].get(current_exercise)
+        if video:
+            with st.expander("▶️ Watch demo"):
+                st.video(video)
+
+        # Next-session target from the overload rule (O(1) lookup)
+        rec = get_recommender(USER).recommend(current_exercise)
+
+        # Info expander
+        with st.expander("ⓘ info"):
+            st.markdown("""
+            <div class="info-text">
+            <strong>Working Weight Selection</strong><br>
+            • Choose a resistance you can move for 5–18 reps only.<br>
+            • If you exceed 18 reps, increase weight.<br>
+            • If you fail before 5 reps, reduce weight.<br>
+            • Final reps should be difficult but controlled, with good form.<br><br>
+            <strong>Warm-Up Protocol</strong><br>
+            • Begin at 50% of your estimated max.<br>
+            • Perform 6–10 controlled, easy reps.<br>
+            • Increase weight to 90% of working weight.<br>
+            • Test the new weight for a few reps.<br>
+            • It should feel challenging but maintainable within the target rep range.
+            </div>
+            """, unsafe_allow_html=True)
+            if rec and rec['warmup']:
+                warmup = ", then ".join(f"{kg:g}kg x {reps}" for kg, reps in rec['warmup'])
+                st.markdown(f'<div class="info-text"><strong>Your warm-up:</strong> {warmup}</div>', unsafe_allow_html=True)
+
+        target_msg = f"Target: {rec['weight']:g}kg x {rec['reps']}" if rec else "No history"
+
+        tab_log, tab_edit = st.tabs(["Log Sets", "Edit"])
+
+        with tab_log:
+            st.caption(f"**{target_msg}**")
+            if rec:
+                st.caption(rec['reason'])
+            pending = get_journal(USER).pending_counts().get(current_exercise)
+            if pending:
+                st.caption(f"⏳ {pending} set(s) saved on this device, waiting to sync")
+            elif any(r['Exercise'] == current_exercise for r in session_rows()):
+                st.caption("✅ Synced")
+            for i in range(1, 4):
+                with st.container(border=True):
+                    st.markdown(f"###### Set {i}")
+                    kw, kr = f"{current_exercise}_w{i}", f"{current_exercise}_r{i}"
+                    
+                    c_w, c_r = st.columns(2)
+                    
+                    # Added max_value and help text
+                    c_w.number_input(
+                        "Kg", 
+                        value=None, 
+                        step=1.25, 
+                        key=kw, 
+                        max_value=150.0, 
+                        help="Maximum weight is 150kg. Please reduce input if higher.",
+                        on_change=update_weights if i==1 else None, 
+                        args=(current_exercise,) if i==1 else None
+                    )
+                    
+                    c_r.number_input(
+                        "Reps", 
+                        value=None, 
+                        step=1, 
+                        key=kr, 
+                        max_value=25,
+                        help="Maximum reps is 25. Please reduce input if higher."
+                    )
+                
+                if i < 3:
+                    st.markdown('<p class="rest-text">Rest 1 min between sets</p>', unsafe_allow_html=True)
+
+            if st.button("SAVE SETS", type="primary", key=f"save_{current_exercise}_{muscle}", use_container_width=True):
+                new_rows, _ = collect_sets(current_exercise)
+                if new_rows:
+                    commit_sets(new_rows)
+                    st.toast(f"{current_exercise} logged!", icon="✅")
+                    # Full rerun so the history section picks up the new rows too
                     st.rerun()
-            st.markdown('</div>', unsafe_allow_html=True)
 
-            current_exercise = st.session_state[anchor_key]
-            
-            # Watch demo
-            video = options[options['Exercise'] == current_exercise].iloc[0]['Video Link']
-            if pd.notna(video) and str(video).strip():
-                with st.expander("▶️ Watch demo"):
-                    st.video(format_youtube_url(str(video).strip()))
-
-            # Info expander
-            with st.expander("ⓘ info"):
-                st.markdown("""
-                <div class="info-text">
-                <strong>Working Weight Selection</strong><br>
-                • Choose a resistance you can move for 5–18 reps only.<br>
-                • If you exceed 18 reps, increase weight.<br>
-                • If you fail before 5 reps, reduce weight.<br>
-                • Final reps should be difficult but controlled, with good form.<br><br>
-                <strong>Warm-Up Protocol</strong><br>
-                • Begin at 50% of your estimated max.<br>
-                • Perform 6–10 controlled, easy reps.<br>
-                • Increase weight to 90% of working weight.<br>
-                • Test the new weight for a few reps.<br>
-                • It should feel challenging but maintainable within the target rep range.
-                </div>
-                """, unsafe_allow_html=True)
-
-            ex_history = history_df[history_df['Exercise'] == current_exercise].copy()
-            target_msg = "No history"
-            if not ex_history.empty:
-                # ex_history['Date'] is already converted in LOAD DATA section
-                last_date = ex_history.sort_values(by='Date').iloc[-1]['Date'].date()
-                last_session = ex_history[ex_history['Date'].dt.date == last_date]
-                if not last_session.empty:
-                    best = last_session.sort_values(by=['Weight', 'Reps']).iloc[-1]
-                    target_msg = f"Target: {float(best['Weight'])}kg x {int(best['Reps'])}"
-
-            tab_log, tab_edit = st.tabs(["Log Sets", "Edit"])
-
-            with tab_log:
-                st.caption(f"**{target_msg}**")
-                for i in range(1, 4):
-                    with st.container(border=True):
-                        st.markdown(f"###### Set {i}")
-                        kw, kr = f"{current_exercise}_w{i}", f"{current_exercise}_r{i}"
-                        
-                        c_w, c_r = st.columns(2)
-                        
-                        # Added max_value and help text
-                        c_w.number_input(
-                            "Kg", 
-                            value=None, 
-                            step=1.25, 
-                            key=kw, 
-                            max_value=150.0, 
-                            help="Maximum weight is 150kg. Please reduce input if higher.",
-                            on_change=update_weights if i==1 else None, 
-                            args=(current_exercise,) if i==1 else None
-                        )
-                        
-                        c_r.number_input(
-                            "Reps", 
-                            value=None, 
-                            step=1, 
-                            key=kr, 
-                            max_value=25,
-                            help="Maximum reps is 25. Please reduce input if higher."
-                        )
-                    
-                    if i < 3:
-                        st.markdown('<p class="rest-text">Rest 1 min between sets</p>', unsafe_allow_html=True)
-
-                if st.button("SAVE SETS", type="primary", key=f"save_{current_exercise}_{muscle}", use_container_width=True):
-                    new_rows = []
-                    for i in range(1, 4):
-                        r = st.session_state.get(f"{current_exercise}_r{i}")
-                        if r:
-                            new_rows.append({
-                                "Date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 
-                                "Exercise": current_exercise, 
-                                "Weight": st.session_state.get(f"{current_exercise}_w{i}") or 0, 
-                                "Reps": r
-                            })
-                    if new_rows:
-                        with st.spinner("Syncing..."):
-                            conn = st.connection("gsheets", type=GSheetsConnection)
-                            conn.update(spreadsheet=SHEET_URL, worksheet="Logs", data=pd.concat([history_df, pd.DataFrame(new_rows)], ignore_index=True))
-                            st.cache_data.clear()
-                        st.toast(f"{current_exercise} logged!", icon="✅")
+        with tab_edit:
+            recent = analytics.recent_logs(history_df, history_index, current_exercise)
+            if recent.empty: st.info("No logs.")
+            else:
+                for _, row in recent.iterrows():
+                    log_id = row['ID']
+                    st.caption(f"{row['Date'].strftime('%d %b')}")
+                    ec1, ec2, ec3 = st.columns([2, 2, 1])
+                    # Edits are written straight back to that one row
+                    ec1.number_input("W", value=float(row['Weight']), key=f"editw_{log_id}", on_change=save_log_edit, args=(log_id,))
+                    ec2.number_input("R", value=int(row['Reps']), key=f"editr_{log_id}", on_change=save_log_edit, args=(log_id,))
+                    if ec3.button("❌", key=f"del_{log_id}"):
+                        with timing.stage("delete"):
+                            get_log_cache(USER).delete(log_id)
+                        buf = session_rows()
+                        buf[:] = [r for r in buf if r['ID'] != log_id]
                         st.rerun()
 
-            with tab_edit:
-                recent = history_df[history_df['Exercise'] == current_exercise].sort_values(by='Date', ascending=False).head(3)
-                if recent.empty: st.info("No logs.")
-                else:
-                    for idx, row in recent.iterrows():
-                        st.caption(f"{row['Date'].strftime('%d %b')}")
-                        ec1, ec2, ec3 = st.columns([2, 2, 1])
-                        nw = ec1.number_input("W", value=float(row['Weight']), key=f"editw_{idx}")
-                        nr = ec2.number_input("R", value=int(row['Reps']), key=f"editr_{idx}")
-                        if ec3.button("❌", key=f"del_{idx}"):
-                            conn = st.connection("gsheets", type=GSheetsConnection)
-                            conn.update(spreadsheet=SHEET_URL, worksheet="Logs", data=history_df.drop(idx))
-                            st.cache_data.clear()
-                            st.rerun()
+# --- WORKOUT SPREAD ---
+day_groups = schedule.get(st.session_state.selected_day, [])
+
+if not day_groups:
+    st.info(f"No workout scheduled for {st.session_state.selected_day}.")
+else:
+    for group in day_groups:
+        muscle_card(group)
+
+    pending_sets = sum(get_journal(USER).pending_counts().values())
+    if pending_sets:
+        sync_status(pending_sets)
+
+    # --- SAVE ALL ---
+    if st.button("Save all", use_container_width=True):
+        all_rows, no_reps = [], []
+        for group in day_groups:
+            exercise = st.session_state.get(f"anchor_{group['group']}_{st.session_state.selected_day}")
+            if exercise:
+                rows, missing_reps = collect_sets(exercise)
+                all_rows += rows
+                if missing_reps:
+                    no_reps.append(exercise)
+        for exercise in no_reps:
+            st.toast(f"{exercise}: weight entered but no reps, not saved", icon="⚠️")
+        if all_rows:
+            commit_sets(all_rows)
+            st.toast(f"{len(all_rows)} sets logged!", icon="✅")
+            st.rerun()
+        elif not no_reps:
+            st.info("Nothing to save yet.")
 
     st.divider()
     if st.button("Complete workout", type="primary", use_container_width=True):
-        # 1. Fetch Fresh Data (bypass cache to get the very latest logs)
-        conn = st.connection("gsheets", type=GSheetsConnection)
-        fresh_history = conn.read(spreadsheet=SHEET_URL, worksheet="Logs", usecols=[0, 1, 2, 3])
-        
-        # 2. Filter for Today
-        today_str = datetime.now().strftime('%Y-%m-%d')
-        today_logs = fresh_history[fresh_history['Date'].str.contains(today_str, na=False)]
+        with timing.stage("complete_workout"):
+            # 1. Today's rows from the log cache (row-count check + tail walk)
+            today_str = datetime.now().strftime('%Y-%m-%d')
+            store_today = get_log_cache(USER).since(today_str)
+            
+            # 2. Reconcile with this session's buffer
+            today_logs = analytics.today_session(session_rows(), store_today)
         
         if not today_logs.empty:
-            # 3. Create HTML Table for Email
-            html_table = """
-            <table style="border-collapse: collapse; width: 100%; border: 1px solid #ddd; font-family: Arial, sans-serif;">
-                <tr style="background-color: #D81B60; color: white;">
-                    <th style="padding: 10px; border: 1px solid #ddd;">Exercise</th>
-                    <th style="padding: 10px; border: 1px solid #ddd;">Weight (kg)</th>
-                    <th style="padding: 10px; border: 1px solid #ddd;">Reps</th>
-                </tr>
-            """
-            for _, row in today_logs.iterrows():
-                html_table += f"""
-                <tr>
-                    <td style="padding: 8px; border: 1px solid #ddd;">{row['Exercise']}</td>
-                    <td style="padding: 8px; border: 1px solid #ddd; text-align: center;">{row['Weight']}</td>
-                    <td style="padding: 8px; border: 1px solid #ddd; text-align: center;">{row['Reps']}</td>
-                </tr>
-                """
-            html_table += "</table>"
-            
-            with st.spinner("Sending summary email..."):
-                if send_workout_email(html_table):
-                    st.balloons()
-                    st.success("Great job! Workout summary sent.")
-                else:
-                    st.warning("Workout saved, but email failed. Check secrets config.")
+            # 3. Email the summary table
+            job_id = send_workout_email(analytics.summary_html(today_logs))
+            if job_id is not None:
+                st.session_state.email_job = job_id
+                st.balloons()
+                st.success("Great job! Workout complete.")
         else:
             st.info("No logs found for today yet.")
 
+    # Delivery status of the last summary email
+    if 'email_job' in st.session_state:
+        job = get_mailer().status(st.session_state.email_job)
+        if job['status'] == SENT:
+            st.caption("📧 Workout summary sent.")
+        elif job['status'] == FAILED:
+            st.warning(f"Workout saved, but email failed: {job['error']}. Check secrets config.")
+        else:
+            email_status(st.session_state.email_job)
+
 # --- NEW SECTION: HISTORY & PROGRESS ---
-st.divider()
-st.header("History & Progress")
-
-tab_hist, tab_prog = st.tabs(["📅 Calendar Review", "📈 Progression"])
-
-with tab_hist:
-    # Calendar Function
-    if not history_df.empty:
-        # Determine date range for the picker
-        min_date = history_df['Date'].dt.date.min()
-        review_date = st.date_input(
-            "Select date to review logs:",
-            value=datetime.now().date(),
-            min_value=min_date,
-            max_value=datetime.now().date()
-        )
+CHART_CAPTIONS = {
+    'Daily volume': "Graph shows **Total Daily Volume** (Sum of Weight × Reps for all sets)",
+    'Top set (kg)': "Graph shows the **heaviest set** of each session",
+    'Est 1RM': "Graph shows **Estimated 1 Rep Max** (Epley) of the best set each session",
+    'Weekly volume': "Graph shows **Total Weekly Volume** (Sum of Weight × Reps, weeks trained)",
+}
+
+# Fragment too, so picking a date or an exercise doesn't rerun the cards
+@st.fragment
+def history_section():
+    raw_logs, _, _, daily_rollup, logs_version = load_history()
+
+    st.divider()
+    st.header("History & Progress")
+
+    summary = get_summary(USER).get()[1]
+    if summary is not None and len(summary) and st.toggle("Include archived years", key="history_archive"):
+        with timing.stage("archive_load"):
+            daily_rollup = get_full_rollup(USER, get_archiver(USER).version, logs_version, raw_logs)
+
+    tab_hist, tab_prog = st.tabs(["📅 Calendar Review", "📈 Progression"])
+
+    with tab_hist, timing.stage("history_calendar"):
+        # Calendar Function
+        if daily_rollup:
+            # Determine date range for the picker
+            min_date = daily_rollup['first_day']
+            review_date = st.date_input(
+                "Select date to review logs:",
+                value=datetime.now().date(),
+                min_value=min_date,
+                max_value=datetime.now().date()
+            )
         
-        # Filter data for selected date
-        day_logs = history_df[history_df['Date'].dt.date == review_date]
+            # Look up the selected date in the rollup
+            day_logs = analytics.day_summary(daily_rollup, review_date)
         
-        if not day_logs.empty:
-            st.dataframe(
-                day_logs[['Exercise', 'Weight', 'Reps', 'Volume']].style.format(
-                    {"Weight": "{:.2f}", "Reps": "{:.0f}","Volume": "{:.0f}"}
-                ),
-                use_container_width=True,
-                hide_index=True
-            )
+            if day_logs is not None and not day_logs.empty:
+                st.dataframe(
+                    day_logs[['Exercise', 'Sets', 'Top Kg', 'Top Reps', 'Volume', 'Est 1RM']].style.format(
+                        {"Top Kg": "{:.2f}", "Top Reps": "{:.0f}", "Volume": "{:.0f}", "Est 1RM": "{:.1f}"}
+                    ),
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                st.info(f"No workouts found for {review_date.strftime('%d %b %Y')}")
         else:
-            st.info(f"No workouts found for {review_date.strftime('%d %b %Y')}")
-    else:
-        st.write("No data available yet.")
-
-with tab_prog:
-    # Progression Graph
-    if not history_df.empty:
-        # User selects exercise from available history
-        ex_options = sorted(history_df['Exercise'].unique())
-        selected_ex = st.selectbox("Select Exercise for Graph:", ex_options)
+            st.write("No data available yet.")
+
+    with tab_prog, timing.stage("history_progression"):
+        # Progression Graph
+        if daily_rollup:
+            # User selects exercise from available history
+            ex_options = daily_rollup['exercises']
+            selected_ex = st.selectbox("Select Exercise for Graph:", ex_options)
         
-        # Filter data for that exercise
-        chart_data = history_df[history_df['Exercise'] == selected_ex].copy()
+            metric = st.radio("Metric", list(analytics.CHART_METRICS), horizontal=True, label_visibility="collapsed")
         
-        # Group by date and sum Volume (Total Daily Volume)
-        daily_volume = chart_data.groupby(chart_data['Date'].dt.date)['Volume'].sum()
+            # Cached per exercise and metric, downsampled for long histories
+            series = analytics.chart_series(daily_rollup, selected_ex, metric)
         
-        if not daily_volume.empty:
-            st.line_chart(daily_volume)
-            st.caption("Graph shows **Total Daily Volume** (Sum of Weight × Reps for all sets)")
+            if not series.empty:
+                st.line_chart(series)
+                st.caption(CHART_CAPTIONS[metric])
+            else:
+                st.write("Not enough data to graph.")
         else:
-            st.write("Not enough data to graph.")
-    else:
-        st.write("No data to graph.")
\ No newline at end of file
+            st.write("No data to graph.")
+
+history_section()
+
+# --- DIAGNOSTICS (hidden, ?diag=1) ---
+if st.query_params.get("diag") == "1":
+    with st.expander("Diagnostics", expanded=True):
+        stages, caches = timing.summary()
+        st.dataframe(pd.DataFrame(stages), use_container_width=True, hide_index=True)
+        st.dataframe(pd.DataFrame(caches), use_container_width=True, hide_index=True)
+        coordinator = getattr(get_store(USER), 'coordinator', None)
+        if coordinator:
+            # Sheets requests: coalesced = shared an in-flight read,
+            # throttled = check skipped over budget, waited = queued for a slot
+            st.dataframe(pd.DataFrame([coordinator.stats()]), use_container_width=True, hide_index=True)
+        if get_archiver(USER).error:
+            st.caption(f"Archive run failed: {get_archiver(USER).error}")
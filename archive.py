@@ -0,0 +1,86 @@
+"""Yearly archival of old sessions.
+
+The Logs table/worksheet is the hot partition: the current year, plus the
+previous one for the first ARCHIVE_AFTER_DAYS of a new year. Older years are
+moved into read-only yearly partitions (see Store) and folded into a
+per-exercise summary, which is the recommender's state at the end of the
+archive (recommend.SUMMARY_COLUMNS). The cards then need only the hot log
+plus the summary; the history tabs load the yearly partitions on demand.
+
+Every step can be retried: partitions skip IDs they already hold, the
+summary is rebuilt from the partitions, and the hot rows go last.
+"""
+import threading
+from datetime import date, timedelta
+
+from recommend import Recommender
+
+# Days into a new year before the previous one is archived
+ARCHIVE_AFTER_DAYS = 90
+
+
+def hot_start(today=None):
+    # First day ("YYYY-MM-DD") that stays in the hot log
+    today = today or date.today()
+    return f"{(today - timedelta(days=ARCHIVE_AFTER_DAYS)).year}-01-01"
+
+
+def archived_summary(store):
+    recommender = Recommender()
+    for year in store.partitions():
+        recommender.extend(store.read_partition(year))
+    return recommender.state_frame()
+
+
+def archive(store, cutoff):
+    """Moves the leading log rows dated before cutoff out of the hot log.
+    Returns how many rows moved."""
+    logs = store.read_logs()
+    dates = logs['Date'].astype(str)
+    n = 0
+    while n < len(dates) and dates.iat[n] < cutoff:
+        n += 1
+    if not n:
+        return 0
+    old = logs.iloc[:n]
+    for year, rows in old.groupby(dates.iloc[:n].str[:4]):
+        store.write_partition(int(year), rows)
+    store.write_summary(archived_summary(store))
+    store.drop_oldest(old['ID'].tolist())
+    return n
+
+
+class Archiver:
+    """Runs archive() on a background thread, at most once a day per process."""
+
+    def __init__(self, store):
+        self.store = store
+        # Bumps after every run that moved rows, for caches of the archive
+        self.version = 0
+        self.error = None
+        self._ran_on = None
+        self._lock = threading.Lock()
+
+    def maybe_run(self, oldest, on_done=None):
+        # oldest: Date of the first hot row. on_done(moved) runs on the
+        # worker thread once rows have moved.
+        today = date.today()
+        cutoff = hot_start(today)
+        with self._lock:
+            if str(oldest) >= cutoff or self._ran_on == today:
+                return False
+            self._ran_on = today
+        threading.Thread(target=self._run, args=(cutoff, on_done), name="pippafit-archive", daemon=True).start()
+        return True
+
+    def _run(self, cutoff, on_done):
+        try:
+            moved = archive(self.store, cutoff)
+        except Exception as e:
+            self.error = str(e)
+            return
+        self.error = None
+        if moved:
+            self.version += 1
+            if on_done:
+                on_done(moved)
@@ -0,0 +1,68 @@
+"""Startup asset stage for the header logos.
+
+The source PNGs in the repo are print-sized (up to 4 MB) but the header shows
+them 250px wide. build_variants() writes 1x/2x resized WebP and optimized PNG
+copies into Streamlit's ./static folder once; file names carry a hash of the
+source, so an unchanged logo is never re-encoded and a changed one gets a new
+URL (safe to cache indefinitely on the client).
+"""
+import hashlib
+import os
+
+from PIL import Image
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL = "app/static"
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def build_variants(src, width=250, scales=(1, 2), out_dir=STATIC_DIR):
+    """Returns {format: {scale: url}} for the resized copies of src."""
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(src))[0].lower()
+    key = f"{stem}-{file_hash(src)}-{width}"
+    variants = {'webp': {}, 'png': {}}
+    image = None
+    for scale in scales:
+        for fmt in variants:
+            name = f"{key}@{scale}x.{fmt}"
+            path = os.path.join(out_dir, name)
+            if not os.path.exists(path):
+                if image is None:
+                    image = Image.open(src)
+                    image.load()
+                size = (width * scale, round(image.height * width * scale / image.width))
+                resized = image.resize(size, Image.LANCZOS)
+                tmp = path + ".tmp"
+                if fmt == 'webp':
+                    resized.save(tmp, "WEBP", quality=85, method=6)
+                else:
+                    resized.save(tmp, "PNG", optimize=True)
+                # Atomic so a half-written file is never served
+                os.replace(tmp, path)
+            variants[fmt][scale] = f"{STATIC_URL}/{name}"
+    return variants
+
+
+def srcset(urls):
+    return ", ".join(f"{url} {scale}x" for scale, url in sorted(urls.items()))
+
+
+def logo_html(light, dark, width=250, alt="Pippafit 65"):
+    # <picture> lets the browser pick theme, format and density itself, so
+    # only one small file is downloaded.
+    return (
+        f'<div class="logo-container"><picture>'
+        f'<source media="(prefers-color-scheme: dark)" type="image/webp" srcset="{srcset(dark["webp"])}">'
+        f'<source media="(prefers-color-scheme: dark)" type="image/png" srcset="{srcset(dark["png"])}">'
+        f'<source type="image/webp" srcset="{srcset(light["webp"])}">'
+        f'<img src="{light["png"][1]}" srcset="{srcset(light["png"])}" width="{width}" alt="{alt}">'
+        f'</picture></div>'
+    )
@@ -0,0 +1,203 @@
+"""Benchmarks app.py against synthetic multi-year logs.
+
+    python bench.py                  # 1, 5 and 20 years
+    python bench.py --years 1 --reruns 3
+
+For each size a synthetic log (every bank day, every week, one exercise per
+target group, 3 sets each) is written to a throwaway SQLite store, then the
+app is driven headless with Streamlit's AppTest: a cold run, warm reruns, a
+Calendar date pick, a Progression pick and "Complete workout"; the same hot
+paths are then timed on analytics directly (core_* stages; today's session
+reads through LogCache.since() on the same store). Years before
+archive.hot_start() are archived up front, so the app runs against the log it
+would have in production, with its own background archival switched off
+(PIPPAFIT_ARCHIVE=0) so none of it lands inside a timed step. The app's own
+timing stages (see timing.py) are collected per size and written as JSON
+lines to bench_output.txt, one line per (size, stage), so two versions can
+be diffed. No network: email points at a closed local port.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import analytics
+import timing
+from archive import archive, hot_start
+from log_cache import LogCache
+from recommend import Recommender
+from storage import BANK_CSV, LOG_COLUMNS, SqliteStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "app.py")
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def generate_logs(years, seed=0, end=None):
+    # Every bank day for `years` up to and including `end` (today), so the
+    # "Complete workout" path always has today's rows to find.
+    rng = random.Random(seed)
+    end = end or date.today()
+    bank = pd.read_csv(BANK_CSV)
+    plan = {
+        day: [(rows['Exercise'].tolist(), rows['Status'].fillna('').str.lower().tolist())
+              for _, rows in day_rows.groupby('Target Group', sort=False)]
+        for day, day_rows in bank.groupby('Day', sort=False)
+    }
+    weights = {}
+    rows = []
+    day = end - timedelta(days=round(years * 365))
+    while day <= end:
+        name = WEEKDAYS[day.weekday()]
+        groups = plan.get(name) or (plan[next(iter(plan))] if day == end else None)
+        if groups:
+            start = datetime(day.year, day.month, day.day, 18, 0)
+            for g, (exercises, status) in enumerate(groups):
+                core = exercises[status.index('core')] if 'core' in status else exercises[0]
+                exercise = core if rng.random() < 0.8 else rng.choice(exercises)
+                # Slow progressive overload with the odd bad day
+                w = weights.get(exercise, rng.randrange(8, 32) * 1.25)
+                weights[exercise] = min(150.0, w + 1.25 * (rng.random() < 0.25))
+                for s in range(3):
+                    rows.append({
+                        'Date': (start + timedelta(minutes=8 * g + 2 * s)).strftime("%Y-%m-%d %H:%M:%S"),
+                        'Exercise': exercise,
+                        'Weight': w,
+                        'Reps': rng.randint(6, 12) - s,
+                        'ID': f"{rng.getrandbits(128):032x}",
+                    })
+        day += timedelta(days=1)
+    return pd.DataFrame(rows, columns=LOG_COLUMNS)
+
+
+def run_app(data_dir, reruns):
+    # Walks the app through its hot paths; wall time per step is recorded
+    # alongside the app's own stages
+    os.environ["PIPPAFIT_STORAGE"] = "sqlite"
+    os.environ["PIPPAFIT_DATA_DIR"] = data_dir
+    os.environ["PIPPAFIT_ARCHIVE"] = "0"
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    timing.reset()
+
+    def step(name, fn):
+        start = time.perf_counter()
+        at = fn()
+        timing.record(name, time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].value}")
+        return at
+
+    at = AppTest.from_file(APP, default_timeout=300)
+    at.secrets["email"] = {"smtp_server": "127.0.0.1", "smtp_port": 9, "sender_email": "bench@localhost",
+                           "receiver_email": "bench@localhost", "starttls": False}
+    step("run_cold", at.run)
+    for _ in range(reruns):
+        step("run_warm", at.run)
+    dates = SqliteStore(os.path.join(data_dir, "pippafit.db")).read_logs()['Date']
+    # Mid-history day for the calendar, then the progression chart
+    review = pd.to_datetime(dates.iloc[len(dates) // 2]).date()
+    step("pick_calendar_day", lambda: at.date_input[0].set_value(review).run())
+    options = at.selectbox[-1].options
+    for ex in options[:reruns]:
+        step("pick_progression", lambda: at.selectbox[-1].set_value(ex).run())
+    complete = next(b for b in at.button if b.label == "Complete workout")
+    step("complete_workout_click", lambda: complete.click().run())
+
+
+def run_core(logs, repeat, store):
+    # The same hot paths called on analytics directly, no Streamlit involved;
+    # today's rows come from a LogCache over the bench store, as in the app
+    bank = pd.read_csv(BANK_CSV)
+    exercises = logs['Exercise'].unique().tolist()
+    today = date.today().strftime('%Y-%m-%d')
+    # What the recommender starts from once old years are archived
+    cutoff = hot_start()
+    hot = logs[logs['Date'] >= cutoff]
+    archived = Recommender()
+    archived.reset(logs[logs['Date'] < cutoff])
+    summary = archived.state_frame()
+    cache = LogCache(store)
+    cache.snapshot()
+    for _ in range(repeat):
+        with timing.stage("core_schedule"):
+            analytics.build_schedule(bank)
+        with timing.stage("core_history_frame"):
+            history_df = analytics.history_frame(logs)
+        with timing.stage("core_history_index"):
+            index = analytics.history_index(history_df)
+        with timing.stage("core_daily_rollup"):
+            rollup = analytics.daily_rollup(history_df)
+        with timing.stage("core_recommender_reset"):
+            recommender = Recommender()
+            recommender.reset(logs)
+        with timing.stage("core_recommender_hot"):
+            seeded = Recommender()
+            seeded.seed(summary)
+            seeded.reset(hot)
+        with timing.stage("core_targets"):
+            for ex in exercises:
+                recommender.recommend(ex)
+                analytics.recent_logs(history_df, index, ex)
+        with timing.stage("core_calendar"):
+            for day in history_df['Day'].iloc[::max(1, len(history_df) // 50)]:
+                analytics.day_summary(rollup, day)
+        with timing.stage("core_progression"):
+            for ex in exercises:
+                for metric in analytics.CHART_METRICS:
+                    analytics.chart_series(rollup, ex, metric)
+        with timing.stage("core_today_session"):
+            today_logs = analytics.today_session([], cache.since(today))
+            analytics.summary_html(today_logs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--out", default=os.path.join(HERE, "bench_output.txt"))
+    args = parser.parse_args(argv)
+
+    meta = {
+        'ts': datetime.now().isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'streamlit': st.__version__,
+    }
+    results = []
+    for years in args.years:
+        logs = generate_logs(years)
+        with tempfile.TemporaryDirectory(prefix="pippafit-bench-") as data_dir:
+            store = SqliteStore(os.path.join(data_dir, "pippafit.db"))
+            store.replace_logs(logs)
+            archive(store, hot_start())
+            run_app(data_dir, args.reruns)
+            run_core(logs, args.reruns, store)
+        stages, caches = timing.summary()
+        for s in stages:
+            results.append({**meta, 'years': years, 'rows': len(logs), 'stage': s['Stage'], 'runs': s['Runs'],
+                            'p50_ms': round(s['p50 ms'], 3), 'p95_ms': round(s['p95 ms'], 3),
+                            'max_ms': round(s['max ms'], 3)})
+        for c in caches:
+            results.append({**meta, 'years': years, 'rows': len(logs), 'cache': c['Cache'],
+                            'hits': c['Hits'], 'misses': c['Misses']})
+        print(f"{years:g} years, {len(logs)} rows")
+        print(pd.DataFrame(stages).to_string(index=False, float_format="{:.1f}".format))
+
+    with open(args.out, "w") as f:
+        for r in results:
+            f.write(json.dumps(r) + "\n")
+    print(f"Wrote {len(results)} results to {args.out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
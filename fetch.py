@@ -0,0 +1,118 @@
+"""Single-flight, quota-aware gate for Google Sheets calls.
+
+Every Sheets call goes through FetchCoordinator.run(). Identical reads
+that overlap (several sessions hitting the same freshness check at once)
+share one in-flight call. The per-minute budget, kept under the Sheets API
+quota, is charged per HTTP request: gate() hooks the HTTP session that
+both our batchGet client and gspread use, so a call that makes three
+requests takes three slots. Once the budget is spent, calls run with
+wait=False raise Throttled straight away so the caller keeps serving what
+it has; everything else waits for a free slot.
+"""
+import threading
+import time
+from collections import deque
+
+
+class Throttled(Exception):
+    pass
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class FetchCoordinator:
+    def __init__(self, per_minute=50, window=60.0):
+        self.per_minute = per_minute
+        self.window = window
+        self._sent = deque()
+        self._flights = {}
+        self._counts = {'requests': 0, 'sent': 0, 'coalesced': 0, 'throttled': 0, 'waited': 0}
+        self._lock = threading.Lock()
+        # wait flag of the run() executing on this thread
+        self._local = threading.local()
+
+    # --- BUDGET ---
+    def _slot_wait(self):
+        # Seconds until a request may go out (0 = now); call with the lock held
+        now = time.monotonic()
+        while self._sent and now - self._sent[0] >= self.window:
+            self._sent.popleft()
+        if len(self._sent) < self.per_minute:
+            return 0.0
+        return self.window - (now - self._sent[0])
+
+    def _acquire(self, wait):
+        waited = False
+        while True:
+            with self._lock:
+                delay = self._slot_wait()
+                if not delay:
+                    self._sent.append(time.monotonic())
+                    self._counts['sent'] += 1
+                    self._counts['waited'] += waited
+                    return
+                if not wait:
+                    self._counts['throttled'] += 1
+                    raise Throttled(f"Sheets budget of {self.per_minute}/min used up")
+            waited = True
+            time.sleep(min(delay, 1.0))
+
+    # --- PUBLIC ---
+    def gate(self, session):
+        """Charges one slot per request made on session (a requests.Session);
+        safe to call again for a session that's already gated."""
+        if getattr(session, '_budget', None) is self:
+            return session
+        send = session.request
+
+        def request(*args, **kwargs):
+            self._acquire(getattr(self._local, 'wait', True))
+            return send(*args, **kwargs)
+
+        session.request = request
+        session._budget = self
+        return session
+
+    def run(self, key, fn, wait=True):
+        """fn() with coalescing; concurrent calls with the same key share
+        one result. key=None never coalesces (writes). With wait=False,
+        any request fn makes over budget raises Throttled instead of
+        queueing."""
+        with self._lock:
+            self._counts['requests'] += 1
+            flight = self._flights.get(key) if key is not None else None
+            if flight is not None:
+                self._counts['coalesced'] += 1
+            else:
+                leader = _Flight()
+                if key is not None:
+                    self._flights[key] = leader
+        if flight is not None:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        outer = getattr(self._local, 'wait', True)
+        self._local.wait = wait
+        try:
+            leader.result = fn()
+            return leader.result
+        except BaseException as e:
+            leader.error = e
+            raise
+        finally:
+            self._local.wait = outer
+            if key is not None:
+                with self._lock:
+                    self._flights.pop(key, None)
+            leader.done.set()
+
+    def stats(self):
+        with self._lock:
+            self._slot_wait()
+            return {**self._counts, 'last_minute': len(self._sent), 'per_minute': self.per_minute}
@@ -0,0 +1,115 @@
+"""Durable write-ahead journal for logged sets.
+
+SAVE SETS commits rows to a local SQLite journal (instant, survives a crash
+or a dead gym connection) and a background flusher pushes everything pending
+to the real store in one batched call. Each row's log ID doubles as its
+idempotency key: a batch whose outcome is unknown (the call raised after the
+remote may already have written it) is checked against the store before it
+is retried, so retries never duplicate rows.
+"""
+import json
+import os
+import threading
+import time
+
+from storage import LOG_COLUMNS, sqlite_transaction
+
+PENDING, SYNCED = "pending", "synced"
+
+
+class Journal:
+    def __init__(self, path, sink, existing_ids, batch_window=1.5, backoff=2.0, max_backoff=60.0):
+        # sink(rows) writes rows to the store in one call; existing_ids(ids)
+        # returns the subset of ids the store already holds.
+        self.path = path
+        self.sink = sink
+        self.existing_ids = existing_ids
+        self.batch_window = batch_window
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.last_error = None
+        self._wake = threading.Event()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with sqlite_transaction(path) as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS journal (
+                    log_id TEXT PRIMARY KEY,
+                    exercise TEXT NOT NULL,
+                    row TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_journal_status ON journal (status, exercise)")
+        self._worker = threading.Thread(target=self._run, name="pippafit-journal", daemon=True)
+        self._worker.start()
+        # Anything left over from a previous run goes out straight away
+        self._wake.set()
+
+    # --- PUBLIC ---
+    def add(self, rows):
+        now = time.time()
+        with sqlite_transaction(self.path) as db:
+            db.executemany(
+                "INSERT OR IGNORE INTO journal (log_id, exercise, row, status, created) VALUES (?, ?, ?, ?, ?)",
+                [(r['ID'], r['Exercise'], json.dumps({c: r.get(c) for c in LOG_COLUMNS}), PENDING, now) for r in rows],
+            )
+        self._wake.set()
+
+    def pending_counts(self):
+        # {exercise: rows not yet in the store}
+        with sqlite_transaction(self.path) as db:
+            return dict(db.execute("SELECT exercise, COUNT(*) FROM journal WHERE status = ? GROUP BY exercise", (PENDING,)))
+
+    # --- FLUSHER ---
+    def _pending(self):
+        with sqlite_transaction(self.path) as db:
+            return db.execute("SELECT log_id, row, attempts FROM journal WHERE status = ? ORDER BY created", (PENDING,)).fetchall()
+
+    def _mark(self, ids, **fields):
+        sets = ", ".join(f"{k} = ?" for k in fields)
+        with sqlite_transaction(self.path) as db:
+            db.executemany(f"UPDATE journal SET {sets} WHERE log_id = ?", [(*fields.values(), i) for i in ids])
+
+    def _flush(self):
+        batch = self._pending()
+        if not batch:
+            return
+        ids = [b[0] for b in batch]
+        retried = [b[0] for b in batch if b[2] > 0]
+        if retried:
+            # A previous attempt may have landed before it failed
+            done = set(self.existing_ids(retried))
+            if done:
+                self._mark(done, status=SYNCED)
+                batch = [b for b in batch if b[0] not in done]
+                ids = [b[0] for b in batch]
+        if not batch:
+            return
+        with sqlite_transaction(self.path) as db:
+            db.executemany("UPDATE journal SET attempts = attempts + 1 WHERE log_id = ?", [(i,) for i in ids])
+        self.sink([json.loads(b[1]) for b in batch])
+        self._mark(ids, status=SYNCED)
+        # Synced rows only need to stick around for a day
+        with sqlite_transaction(self.path) as db:
+            db.execute("DELETE FROM journal WHERE status = ? AND created < ?", (SYNCED, time.time() - 86400))
+
+    def _run(self):
+        delay = self.backoff
+        while True:
+            self._wake.wait()
+            # Give quick successive saves a moment to land in the same batch
+            time.sleep(self.batch_window)
+            self._wake.clear()
+            try:
+                self._flush()
+                self.last_error = None
+                delay = self.backoff
+            except Exception as e:
+                self.last_error = str(e)
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+                self._wake.set()
@@ -0,0 +1,282 @@
+"""In-process cache of the Logs table.
+
+The log is downloaded once and then kept current in place: our own writes
+are applied locally as they happen, and remote changes (another phone
+saving sets) are picked up with a cheap row-count check instead of a full
+re-download, run on a background thread so a render never waits on it. ``version`` bumps on every change so derived data can be
+cached per version.
+
+The cached frame is shared read-only by every session (app.py keeps one
+LogCache per process): writes never touch it in place, they build the next
+frame and swap the reference under the lock. String columns are Arrow
+backed, and with copy-on-write a session's slices and views share the
+columns rather than copying them.
+
+With a snapshot_path the cache starts from the last copy saved on disk and
+does the first remote load in the background, so a cold start doesn't wait
+on the network.
+"""
+import threading
+import time
+
+import pandas as pd
+
+import timing
+from fetch import Throttled
+from snapshot import read_snapshot, write_snapshot
+from storage import LOG_COLUMNS, empty_logs, with_log_columns
+
+STRING_COLUMNS = ['Date', 'Exercise', 'ID']
+
+
+def shared_frame(df):
+    # Compact Arrow strings (one buffer per column instead of a Python
+    # object per cell); numbers are left as the store returned them.
+    df = df[LOG_COLUMNS]
+    return df.astype({c: "string[pyarrow]" for c in STRING_COLUMNS})
+
+
+class LogCache:
+    # Seconds to wait after a failed load or check before trying again
+    RETRY_SECONDS = 30
+
+    def __init__(self, store, check_every=10, snapshot_path=None, name=None):
+        # name: timing counter; snapshot() calls served without a fetch are
+        # hits, every load and tail read a miss
+        self.store = store
+        self.name = name
+        self.check_every = check_every
+        self.snapshot_path = snapshot_path
+        self.version = 0
+        # stale: serving the on-disk snapshot until the first remote load lands
+        self.stale = False
+        self.error = None
+        self._df = None
+        self._checked_at = 0.0
+        self._loading = False
+        # An append not yet checked against the remote row count
+        self._unverified = False
+        # Bumped by every local change, so a background load or check that
+        # started before one isn't applied over it
+        self._writes = 0
+        self._fetches = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+        if snapshot_path:
+            # Very first start has no snapshot yet: render with an empty log
+            local = read_snapshot(snapshot_path)
+            self._df = shared_frame(empty_logs() if local is None else with_log_columns(local))
+            self.version += 1
+            self.stale = True
+
+    def _fetch(self, wait=True):
+        # read_logs_since(0) is the same full read, but one that raises
+        # Throttled instead of queueing when a remote store is over budget
+        read = self.store.read_logs if wait else lambda: self.store.read_logs_since(0)
+        df = read()
+        if df['ID'].isna().any():
+            # Legacy rows: give them stable IDs once, then read back
+            self.store.backfill_ids()
+            df = read()
+        return shared_frame(df.reset_index(drop=True))
+
+    def _fetched(self):
+        self._fetches += 1
+        if self.name:
+            timing.count(self.name, hit=False)
+
+    def _install(self, df):
+        self._fetched()
+        self._df = df
+        self._checked_at = time.monotonic()
+        self.version += 1
+        self.stale = False
+        self.error = None
+        self._unverified = False
+        self._reset_listeners()
+        if self.snapshot_path:
+            write_snapshot(df, self.snapshot_path)
+
+    # Listeners keep incremental state off the log: extend(rows) gets rows
+    # appended at the end, reset(df) the whole frame after anything else
+    # (reloads, edits, deletes). Both run under the cache lock.
+    def subscribe(self, listener):
+        with self._lock:
+            if self._df is not None:
+                listener.reset(self._df)
+            self._listeners.append(listener)
+
+    def _reset_listeners(self):
+        for listener in self._listeners:
+            listener.reset(self._df)
+
+    def reset_listeners(self):
+        # For when a listener's own inputs changed (a new archive summary)
+        with self._lock:
+            if self._df is not None:
+                self._reset_listeners()
+
+    def _extend_listeners(self, rows):
+        for listener in self._listeners:
+            listener.extend(rows)
+
+    def _load(self, wait=True):
+        self._install(self._fetch(wait))
+
+    def _start(self, target):
+        # Under the lock: one background fetch at a time
+        self._loading = True
+        threading.Thread(target=target, args=(self._writes,), name="pippafit-logs", daemon=True).start()
+
+    def _finish(self, error=None):
+        # Under the lock, once a background fetch is over. The next one is
+        # due check_every seconds after this one ended, or RETRY_SECONDS
+        # after a failure, so a store that hangs instead of refusing
+        # connections isn't asked again straight away.
+        self._loading = False
+        self._checked_at = time.monotonic()
+        if error:
+            self.error = error
+            self._checked_at += max(0, self.RETRY_SECONDS - self.check_every)
+
+    def _background_load(self, writes):
+        try:
+            df = self._fetch()
+        except Exception as e:
+            with self._lock:
+                self._finish(str(e))
+            return
+        with self._lock:
+            # A load may have landed meanwhile, or a write made this copy
+            # old before it arrived (the next due check loads again)
+            if self.stale and self._writes == writes:
+                self._install(df)
+            self._finish()
+
+    def _background_check(self, writes):
+        # High-water mark: compare row counts, pull only the tail if the
+        # remote grew, fall back to a full reload if it shrank or an append
+        # of ours couldn't be lined up with it. The requests run off the
+        # lock, so renders keep being served the cached frame; a result is
+        # dropped if a local change landed meanwhile. Over the request
+        # budget, just try again at the next check.
+        with self._lock:
+            if self._df is None:
+                self._finish()
+                return
+            local, unverified = len(self._df), self._unverified
+        tail = df = None
+        try:
+            remote = self.store.log_count()
+            if remote > local and not unverified:
+                tail = shared_frame(self.store.read_logs_since(local))
+            elif remote != local:
+                df = self._fetch(wait=False)
+        except Throttled:
+            with self._lock:
+                self._finish()
+            return
+        except Exception as e:
+            with self._lock:
+                self._finish(str(e))
+            return
+        with self._lock:
+            self.error = None
+            if self._writes == writes:
+                if df is not None:
+                    self._install(df)
+                elif tail is not None:
+                    self._fetched()
+                    self._df = pd.concat([self._df, tail], ignore_index=True)
+                    self.version += 1
+                    self._extend_listeners(tail)
+                    if self.snapshot_path:
+                        write_snapshot(self._df, self.snapshot_path)
+                else:
+                    self._unverified = False
+            self._finish()
+
+    def snapshot(self):
+        # (version, frame) read together so derived caches key off the
+        # version that actually matches the frame. Only the very first load
+        # (no snapshot on disk) waits for the store; after that loads and
+        # freshness checks run in the background.
+        with self._lock:
+            fetches = self._fetches
+            due = time.monotonic() - self._checked_at >= self.check_every
+            if self._df is None:
+                self._load()
+            elif due and not self._loading:
+                self._start(self._background_load if self.stale else self._background_check)
+            if self.name and self._fetches == fetches:
+                timing.count(self.name, hit=True)
+            return self.version, self._df
+
+    def since(self, start):
+        # Rows dated on/after start ("YYYY-MM-DD..." string). Logs are
+        # appended in time order, so walk back from the tail instead of
+        # scanning the whole frame. Sets from other devices are picked up
+        # by a load or check started here in the background; until it lands
+        # (or offline) this is the cached tail, and callers add their own
+        # buffer.
+        with self._lock:
+            if self._df is None:
+                self._load()
+            elif not self._loading:
+                self._start(self._background_load if self.stale else self._background_check)
+            dates = self._df['Date']
+            i = len(dates)
+            while i and str(dates.iat[i - 1]) >= start:
+                i -= 1
+            # A view: copy-on-write keeps the shared frame safe
+            return self._df.iloc[i:]
+
+    # Store writes may queue for the request budget, so they happen before
+    # taking the lock: other sessions keep reading meanwhile.
+    def append(self, rows):
+        self.store.append_logs(rows)
+        with self._lock:
+            if self._df is None or not rows:
+                return
+            self._writes += 1
+            new = shared_frame(pd.DataFrame(rows, columns=LOG_COLUMNS))
+            self._df = pd.concat([self._df, new], ignore_index=True) if len(self._df) else new
+            self.version += 1
+            self._extend_listeners(new)
+            if self.stale:
+                return  # The next background load brings the remote copy
+            # Someone else may have written in the meantime, and then our
+            # tail no longer lines up with the remote rows: the next check,
+            # due now, reloads unless the counts still match
+            self._unverified = True
+            self._checked_at = 0.0
+
+    def update(self, log_id, weight, reps):
+        self.store.update_log(log_id, weight, reps)
+        with self._lock:
+            if self._df is not None:
+                self._writes += 1
+                # New Weight/Reps columns; the rest are shared with the old
+                # frame, which stays untouched for readers holding it
+                match = self._df['ID'] == log_id
+                self._df = self._df.assign(Weight=self._df['Weight'].mask(match, weight),
+                                           Reps=self._df['Reps'].mask(match, reps))
+                self.version += 1
+                self._reset_listeners()
+
+    def delete(self, log_id):
+        try:
+            self.store.delete_log(log_id)
+        except KeyError:
+            pass  # Already deleted elsewhere; just drop our copy
+        with self._lock:
+            if self._df is not None:
+                self._writes += 1
+                self._df = self._df[self._df['ID'] != log_id].reset_index(drop=True)
+                self.version += 1
+                self._reset_listeners()
+
+    def invalidate(self):
+        with self._lock:
+            self._writes += 1
+            self._df = None
@@ -0,0 +1,123 @@
+"""Background email sender for workout summaries.
+
+Messages are queued and sent by a single worker thread that keeps one SMTP
+session open between sends (re-checked with NOOP, reopened if the server
+dropped it) and retries failures with exponential backoff. The UI only ever
+enqueues and reads job status, so it never waits on the mail server.
+
+For local testing point the [email] secrets at a debugging server, e.g.
+``python -m aiosmtpd -n -l localhost:1025`` with ``starttls = false``.
+"""
+import itertools
+import queue
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+QUEUED, SENDING, SENT, FAILED = "queued", "sending", "sent", "failed"
+
+
+class Mailer:
+    def __init__(self, host, port, sender, password=None, starttls=True,
+                 retries=3, backoff=2.0, idle_timeout=120, timeout=20, on_done=None):
+        self.host = host
+        self.port = int(port)
+        self.sender = sender
+        self.password = password
+        self.starttls = starttls
+        self.retries = retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        # Called on the worker thread with the final job status
+        self.on_done = on_done
+        self._smtp = None
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="pippafit-mailer", daemon=True)
+        self._worker.start()
+
+    # --- PUBLIC ---
+    def send(self, to, subject, html):
+        msg = MIMEMultipart()
+        msg['From'] = "Pippafit App <" + self.sender + ">"
+        msg['To'] = to
+        msg['Subject'] = subject
+        msg.attach(MIMEText(html, 'html'))
+
+        job_id = next(self._ids)
+        with self._lock:
+            self._jobs[job_id] = {'status': QUEUED, 'error': None, 'attempts': 0, 'seconds': None}
+        self._queue.put((job_id, msg))
+        return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            return dict(self._jobs.get(job_id, {'status': FAILED, 'error': "Unknown email job", 'attempts': 0, 'seconds': None}))
+
+    # --- WORKER ---
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _connection(self):
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except smtplib.SMTPException:
+                pass
+            self._close()
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            smtp.starttls()
+        if self.password:
+            smtp.login(self.sender, self.password)
+        self._smtp = smtp
+        return smtp
+
+    def _close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._smtp = None
+
+    def _deliver(self, job_id, msg):
+        start = time.perf_counter()
+        status = FAILED
+        for attempt in range(1, self.retries + 1):
+            self._update(job_id, status=SENDING, attempts=attempt)
+            try:
+                self._connection().send_message(msg)
+                self._update(job_id, error=None)
+                status = SENT
+                break
+            except (smtplib.SMTPException, OSError) as e:
+                # Drop the session so the next attempt starts clean
+                self._close()
+                self._update(job_id, error=str(e))
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+        self._update(job_id, status=status, seconds=time.perf_counter() - start)
+        if self.on_done:
+            try:
+                self.on_done(self.status(job_id))
+            except Exception:
+                pass
+
+    def _run(self):
+        while True:
+            try:
+                job_id, msg = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                # Nothing to send for a while: let the server have its socket back
+                self._close()
+                continue
+            self._deliver(job_id, msg)
@@ -0,0 +1,169 @@
+"""Progressive-overload targets per exercise.
+
+Applies the rule from the card's info box: work in 5-18 reps, add weight
+once you go past 18, drop it if you fail before 5, and warm up at 50% of
+estimated max then 90% of working weight. State is kept per exercise and
+updated as sets are logged (see LogCache.subscribe), so a card's target is
+a dict lookup instead of a pass over the history. The state of archived
+years is saved as a summary frame (state_frame()) and seeds the
+recommender, so only the hot log has to be replayed.
+"""
+import threading
+
+import pandas as pd
+
+MIN_REPS, MAX_REPS = 5, 18
+# Reps to aim for right after a weight change
+RESET_REPS = 10
+# kg, same step as the weight inputs
+STEP = 1.25
+MAX_WEIGHT = 150.0
+# Share of the newest session in the rolling 1RM
+ALPHA = 0.3
+# Sessions without a new best 1RM before it counts as a stall
+STALL_SESSIONS = 3
+# One row per exercise in the archive summary
+SUMMARY_COLUMNS = ['Exercise', 'Day', 'Top Kg', 'Top Reps', 'E1RM', 'Rolling', 'Best', 'Best Kg', 'Since Best']
+
+
+def e1rm(weight, reps):
+    # Epley, same as the Progression tab's Est 1RM
+    return weight * (1 + reps / 30)
+
+
+def round_weight(kg):
+    return min(MAX_WEIGHT, max(0.0, round(kg / STEP) * STEP))
+
+
+def _new_state():
+    return {
+        'day': None,        # open (latest) session
+        'top': (0.0, 0),    # its top set, heaviest then most reps
+        'e1rm': 0.0,        # its best estimated 1RM
+        'rolling': None,    # EWMA of closed sessions' 1RM
+        'best': 0.0,        # best closed-session 1RM
+        'best_weight': 0.0, # top weight in that session
+        'since_best': 0,    # closed sessions since then
+    }
+
+
+def _close(s):
+    # Fold the open session into the rolling stats
+    if s['day'] is None:
+        return
+    x = s['e1rm']
+    s['rolling'] = x if s['rolling'] is None else ALPHA * x + (1 - ALPHA) * s['rolling']
+    if x > s['best']:
+        s['best'], s['best_weight'], s['since_best'] = x, s['top'][0], 0
+    else:
+        s['since_best'] += 1
+
+
+def _feed(state, df):
+    # Rows must arrive in log (time) order
+    days = df['Date'].astype(str).str[:10].tolist()
+    weights = pd.to_numeric(df['Weight'], errors='coerce').fillna(0).astype(float).tolist()
+    reps = pd.to_numeric(df['Reps'], errors='coerce').fillna(0).astype(int).tolist()
+    for day, exercise, w, r in zip(days, df['Exercise'].tolist(), weights, reps):
+        if not isinstance(exercise, str):
+            continue
+        s = state.get(exercise)
+        if s is None:
+            s = state[exercise] = _new_state()
+        if day != s['day']:
+            _close(s)
+            s['day'], s['top'], s['e1rm'] = day, (w, r), e1rm(w, r)
+        else:
+            s['top'] = max(s['top'], (w, r))
+            s['e1rm'] = max(s['e1rm'], e1rm(w, r))
+
+
+def _states_from_frame(summary):
+    states = {}
+    if summary is None:
+        return states
+    for row in summary[SUMMARY_COLUMNS].itertuples(index=False):
+        exercise, day, top_w, top_r, x, rolling, best, best_w, since = row
+        states[exercise] = {
+            'day': str(day), 'top': (float(top_w), int(top_r)), 'e1rm': float(x),
+            'rolling': None if pd.isna(rolling) else float(rolling),
+            'best': float(best), 'best_weight': float(best_w), 'since_best': int(since),
+        }
+    return states
+
+
+class Recommender:
+    def __init__(self):
+        self._seed = {}
+        self.seed_version = None
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def seed(self, summary, version=None):
+        # summary: state_frame() of the archived years to start from;
+        # takes effect on the next reset()
+        with self._lock:
+            self._seed = _states_from_frame(summary)
+            self.seed_version = version
+
+    # --- LogCache listener ---
+    def reset(self, df):
+        with self._lock:
+            state = {ex: dict(s) for ex, s in self._seed.items()}
+        _feed(state, df)
+        with self._lock:
+            self._state = state
+
+    def extend(self, rows):
+        with self._lock:
+            _feed(self._state, rows)
+
+    # --- PUBLIC ---
+    def state_frame(self):
+        with self._lock:
+            rows = [
+                [ex, s['day'], s['top'][0], s['top'][1], s['e1rm'], s['rolling'], s['best'], s['best_weight'], s['since_best']]
+                for ex, s in sorted(self._state.items())
+            ]
+        return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+    def recommend(self, exercise):
+        """Next-session target for exercise, or None with no history.
+
+        Returns {weight, reps, reason, warmup [(kg, reps)], e1rm, position
+        (0-1 within 5-18 reps), stalled}.
+        """
+        with self._lock:
+            s = self._state.get(exercise)
+            if s is None:
+                return None
+            s = dict(s)
+        # The open session counts as if it were closed now
+        _close(s)
+        w, r = s['top']
+        stalled = s['since_best'] >= STALL_SESSIONS and w >= s['best_weight']
+
+        if w <= 0:
+            weight, reps, reason = 0.0, min(r + 1, MAX_REPS), "One more rep than last time"
+        elif r >= MAX_REPS:
+            weight = max(round_weight(w + STEP), round_weight(e1rm(w, r) / (1 + RESET_REPS / 30)))
+            reps, reason = RESET_REPS, f"Hit {r} reps: time to go heavier"
+        elif r < MIN_REPS:
+            weight = min(round_weight(w - STEP), round_weight(e1rm(w, r) / (1 + RESET_REPS / 30)))
+            reps, reason = RESET_REPS, f"Only {r} reps: lighten it and build back up"
+        elif stalled:
+            weight, reps = round_weight(w * 0.9), r
+            reason = f"No new best in {s['since_best']} sessions: drop 10% and build back up"
+        else:
+            weight, reps, reason = w, r + 1, "Same weight, one more rep"
+
+        warmup = [(round_weight(s['rolling'] * 0.5), "6-10"), (round_weight(weight * 0.9), "a few")] if weight else []
+        return {
+            'weight': weight,
+            'reps': reps,
+            'reason': reason,
+            'warmup': warmup,
+            'e1rm': s['rolling'],
+            'position': min(1.0, max(0.0, (r - MIN_REPS) / (MAX_REPS - MIN_REPS))),
+            'stalled': stalled,
+        }
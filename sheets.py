@@ -0,0 +1,82 @@
+"""Pooled Google Sheets data client.
+
+Reads go straight to the Sheets values:batchGet endpoint over one HTTP
+session (gspread's authorized session in the app, shared by every call and
+every browser session), so any number of ranges across worksheets costs a
+single round trip and no spreadsheet/worksheet metadata lookups. Writes
+still use gspread Worksheet handles, opened (or created) once per worksheet
+and kept.
+
+The base URL is a parameter, so the client runs against a local HTTP stub
+with a plain requests.Session:
+
+    SheetsClient(requests.Session(), "sheet-id", base_url="http://127.0.0.1:8000/v4/spreadsheets")
+"""
+import re
+import threading
+
+SHEETS_API = "https://sheets.googleapis.com/v4/spreadsheets"
+
+
+def spreadsheet_key(spreadsheet):
+    # Accepts the full URL from secrets or a bare spreadsheet ID
+    match = re.search(r"/spreadsheets/d/([a-zA-Z0-9_-]+)", spreadsheet)
+    return match.group(1) if match else spreadsheet
+
+
+def a1(worksheet, cells):
+    return "'{}'!{}".format(worksheet.replace("'", "''"), cells)
+
+
+class SheetsClient:
+    def __init__(self, session, spreadsheet, base_url=SHEETS_API, open_spreadsheet=None, timeout=30):
+        # open_spreadsheet() -> gspread Spreadsheet, only needed for writes
+        self.session = session
+        self.key = spreadsheet_key(spreadsheet)
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._open_spreadsheet = open_spreadsheet
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_connection(cls, conn, spreadsheet):
+        # Reuse the service-account gspread client behind st.connection
+        gc = conn.client._client
+        key = spreadsheet_key(spreadsheet)
+        return cls(gc.session, key, open_spreadsheet=lambda: gc.open_by_key(key))
+
+    def values(self, ranges):
+        """Rows (lists of strings) for each A1 range, in one request."""
+        response = self.session.get(
+            f"{self.base_url}/{self.key}/values:batchGet",
+            params={'ranges': list(ranges), 'majorDimension': 'ROWS'},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return [r.get('values', []) for r in response.json().get('valueRanges', [])]
+
+    def worksheet_titles(self):
+        response = self.session.get(
+            f"{self.base_url}/{self.key}",
+            params={'fields': 'sheets.properties.title'},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return [s['properties']['title'] for s in response.json().get('sheets', [])]
+
+    def worksheet(self, title, cols=None):
+        # With cols, a missing worksheet is created with that many columns
+        from gspread.exceptions import WorksheetNotFound
+        with self._lock:
+            if title not in self._worksheets:
+                if self._spreadsheet is None:
+                    self._spreadsheet = self._open_spreadsheet()
+                try:
+                    self._worksheets[title] = self._spreadsheet.worksheet(title)
+                except WorksheetNotFound:
+                    if cols is None:
+                        raise
+                    self._worksheets[title] = self._spreadsheet.add_worksheet(title, rows=1, cols=cols)
+            return self._worksheets[title]
@@ -0,0 +1,103 @@
+"""Local snapshots for fast cold starts.
+
+On start-up the page renders from files on disk (the last copy of the remote
+data, or the bundled Pippafit_data.csv) while the real read from Google
+Sheets runs in the background; the remote copy is swapped in when it
+arrives and written back to disk for the next cold start.
+"""
+import os
+import threading
+import time
+
+import pandas as pd
+
+import timing
+
+
+def read_snapshot(path):
+    if path and os.path.exists(path) and os.path.getsize(path):
+        return pd.read_csv(path)
+    return None
+
+
+def write_snapshot(df, path):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp = path + ".tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+class RefreshingValue:
+    """A remote value served stale-while-revalidate.
+
+    get() never blocks on the fetch once a local fallback exists: it returns
+    (version, value) straight away and refreshes in a background thread at
+    most every ttl seconds. ``ready`` turns True once a remote copy is in.
+    Without a fallback the first fetch happens here, blocking, and counts
+    as fresh. The value may be None (nothing stored remotely yet).
+    With a name, gets count as timing hits and fetches as misses.
+    """
+
+    def __init__(self, fetch, fallback=None, ttl=600, snapshot_path=None, name=None):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.name = name
+        self.version = 0
+        self.ready = False
+        self.error = None
+        self._fetched_at = None
+        self._value = read_snapshot(snapshot_path)
+        if self._value is None and fallback is None:
+            self._value = fetch()
+            self._count(hit=False)
+            self.ready = True
+            self._fetched_at = time.monotonic()
+        elif self._value is None:
+            self._value = fallback()
+        self._loading = False
+        self._lock = threading.Lock()
+
+    def _count(self, hit):
+        if self.name:
+            timing.count(self.name, hit=hit)
+
+    def _refresh(self):
+        try:
+            value = self.fetch()
+        except Exception as e:
+            with self._lock:
+                self.error = str(e)
+                self._loading = False
+                # Try again in 30s rather than a full ttl
+                self._fetched_at = time.monotonic() - self.ttl + min(self.ttl, 30)
+            return
+        self._count(hit=False)
+        with self._lock:
+            self._value = value
+            self.version += 1
+            self.ready = True
+            self.error = None
+            self._loading = False
+        if self.snapshot_path and value is not None:
+            write_snapshot(value, self.snapshot_path)
+
+    def refresh(self):
+        # Blocking fetch now, for when we've just changed the remote copy
+        with self._lock:
+            self._loading = True
+            self._fetched_at = time.monotonic()
+        self._refresh()
+
+    def get(self):
+        with self._lock:
+            due = self._fetched_at is None or time.monotonic() - self._fetched_at >= self.ttl
+            if due and not self._loading:
+                self._loading = True
+                self._fetched_at = time.monotonic()
+                threading.Thread(target=self._refresh, name="pippafit-refresh", daemon=True).start()
+            # Served from memory either way; the refresh counts its own miss
+            self._count(hit=True)
+            return self.version, self._value
@@ -0,0 +1,716 @@
+"""Storage backends for Pippafit.
+
+Every backend exposes the same small surface (see ``Store``) so app.py can
+run against the Google Sheet, a local SQLite database or a plain CSV file
+without caring which one is behind it. Each athlete's log is stored apart
+from everyone else's (see make_store).
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+import requests
+
+from fetch import FetchCoordinator
+from sheets import SheetsClient, a1
+
+# ID is a stable per-row key (uuid hex) so edits/deletes target the right
+# row even if other devices have written since we last read.
+LOG_COLUMNS = ['Date', 'Exercise', 'Weight', 'Reps', 'ID']
+MOVEMENT_COLUMNS = ['Day', 'Target Group', 'Status', 'Exercise', 'Video Link']
+BANK_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Pippafit_data.csv")
+
+
+def empty_logs():
+    return pd.DataFrame(columns=LOG_COLUMNS)
+
+
+def new_log_id():
+    return uuid.uuid4().hex
+
+
+def with_log_columns(df):
+    # Older logs predate the ID column
+    df = df.reindex(columns=LOG_COLUMNS)
+    df['ID'] = df['ID'].astype(object)
+    return df
+
+
+def rows_to_values(rows):
+    # Sheet/CSV friendly list-of-lists in LOG_COLUMNS order
+    return [[row.get(col) for col in LOG_COLUMNS] for row in rows]
+
+
+@contextmanager
+def sqlite_transaction(path):
+    # sqlite3's own context manager commits but never closes; do both.
+    # One short-lived connection per call also keeps this safe across
+    # Streamlit's session threads.
+    db = sqlite3.connect(path)
+    try:
+        with db:
+            yield db
+    finally:
+        db.close()
+
+
+class Store:
+    """Interface shared by every backend.
+
+    read_movements() -> Exercise_bank frame (MOVEMENT_COLUMNS)
+    read_logs()      -> Logs frame (LOG_COLUMNS)
+    append_logs(rows)  adds new log rows (list of dicts) without touching the rest
+    replace_logs(df)   overwrites the whole log with df
+    update_log(log_id, weight, reps) / delete_log(log_id)  touch one row by ID
+    backfill_ids()     gives legacy rows without an ID one (one-off migration)
+    existing_ids(ids)  which of ids are already stored (idempotent retries)
+
+    log_count() and read_logs_since(n) let callers poll for new rows without
+    downloading the whole log; the defaults fall back to a full read.
+    Remote backends may raise fetch.Throttled from log_count() and
+    read_logs_since() when their request budget is spent instead of
+    queueing: the caller should keep the data it has.
+
+    The log above is the hot partition. archive.py moves whole past years
+    out of it into read-only yearly partitions:
+    partitions()            archived years, oldest first
+    read_partition(year) / write_partition(year, df)  a year's rows; writes
+                            skip IDs already there, so a retry is harmless
+    drop_oldest(ids)        removes the first len(ids) log rows, which must
+                            carry exactly these IDs (KeyError otherwise)
+    read_summary() / write_summary(df)  per-exercise summary of everything
+                            archived (recommend.SUMMARY_COLUMNS), or None
+    """
+
+    def read_movements(self):
+        raise NotImplementedError
+
+    def read_logs(self):
+        raise NotImplementedError
+
+    def log_count(self):
+        return len(self.read_logs())
+
+    def read_logs_since(self, n):
+        return self.read_logs().iloc[n:].reset_index(drop=True)
+
+    def append_logs(self, rows):
+        raise NotImplementedError
+
+    def replace_logs(self, df):
+        raise NotImplementedError
+
+    # Whole-log fallbacks; remote backends override these with row-level calls
+    def update_log(self, log_id, weight, reps):
+        df = self.read_logs()
+        match = df['ID'] == log_id
+        if not match.any():
+            raise KeyError(f"Log entry {log_id} no longer exists")
+        df.loc[match, ['Weight', 'Reps']] = [weight, reps]
+        self.replace_logs(df)
+
+    def delete_log(self, log_id):
+        df = self.read_logs()
+        match = df['ID'] == log_id
+        if not match.any():
+            raise KeyError(f"Log entry {log_id} no longer exists")
+        self.replace_logs(df[~match])
+
+    def existing_ids(self, ids):
+        return set(self.read_logs()['ID']) & set(ids)
+
+    def backfill_ids(self):
+        df = self.read_logs()
+        missing = df['ID'].isna()
+        if missing.any():
+            df.loc[missing, 'ID'] = [new_log_id() for _ in range(missing.sum())]
+            self.replace_logs(df)
+
+    # No archive unless the backend keeps one
+    def partitions(self):
+        return []
+
+    def read_partition(self, year):
+        return empty_logs()
+
+    def read_summary(self):
+        return None
+
+    def write_partition(self, year, df):
+        raise NotImplementedError
+
+    def drop_oldest(self, ids):
+        raise NotImplementedError
+
+    def write_summary(self, df):
+        raise NotImplementedError
+
+
+def _check_oldest(found, ids):
+    # drop_oldest() guard: the log must still start with the archived rows
+    if list(found) != list(ids):
+        raise KeyError("The log changed while archiving; try again")
+
+
+def frame_values(df):
+    # Frame -> plain list-of-lists with None for blanks
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+
+# --- GOOGLE SHEETS ---
+def _rows_frame(rows, columns):
+    # Sheet rows (strings, ragged, header first) -> frame with our column names
+    width = len(columns)
+    body = [r[:width] + [""] * (width - len(r)) for r in rows[1:] if any(r)]
+    df = pd.DataFrame(body, columns=columns)
+    return df.mask(df.eq(""))
+
+
+def _log_frame(rows):
+    # A log entry is a row with a Date; see _dated_rows()
+    df = _rows_frame(rows, LOG_COLUMNS)
+    df = df[df['Date'].notna()].reset_index(drop=True)
+    if df.empty:
+        return empty_logs()
+    df['Weight'] = pd.to_numeric(df['Weight'], errors='coerce')
+    df['Reps'] = pd.to_numeric(df['Reps'], errors='coerce')
+    return with_log_columns(df)
+
+
+def _dated_rows(column):
+    # Sheet row numbers (1-based) of the log entries in an A:A fetch: rows
+    # with a Date, skipping the header and any blank rows in between, so
+    # counts and offsets line up with _log_frame()
+    return [i for i, r in enumerate(column, start=1) if i > 1 and r and r[0]]
+
+
+def _summary_frame(rows):
+    # Header row names the columns; numeric ones come back as numbers
+    if not rows:
+        return None
+    df = _rows_frame(rows, rows[0])
+    for col in df.columns:
+        numbers = pd.to_numeric(df[col], errors='coerce')
+        if numbers.notna().sum() == df[col].notna().sum():
+            df[col] = numbers
+    return df
+
+
+class GSheetsStore(Store):
+    # Every call goes through the coordinator (see fetch.py): reads are
+    # keyed so overlapping identical ones share a request, writes (key None)
+    # never coalesce. Each HTTP request on the client's session takes a
+    # budget slot. Reads use the pooled values:batchGet client (see
+    # sheets.py); writes use its cached worksheet handles.
+    # On a cold start the exercise bank, the log and the archive summary
+    # come in one batch; whatever wasn't asked for is kept for STASH_SECONDS
+    # for the other readers, so the first page costs one round trip. After
+    # that each read fetches only its own worksheet.
+    # Archived years live in their own worksheets, "Logs_2024" and so on.
+    STASH_SECONDS = 10
+
+    def __init__(self, conn, spreadsheet, worksheet="Logs", bank_worksheet="Exercise_bank",
+                 summary_worksheet="Log_summary", coordinator=None, client=None, create_log=False):
+        self.conn = conn
+        self.spreadsheet = spreadsheet
+        self.worksheet = worksheet
+        self.bank_worksheet = bank_worksheet
+        self.summary_worksheet = summary_worksheet
+        self.coordinator = coordinator or FetchCoordinator()
+        self.client = client or SheetsClient.from_connection(conn, spreadsheet)
+        self.coordinator.gate(self.client.session)
+        # Unknown until the first read; the summary sheet only exists once
+        # something has been archived
+        self._has_summary = None
+        self._warm = False
+        # create_log: a new athlete's worksheet may not exist yet; it's made
+        # with the first request (see _ensure_log)
+        self._create_log = create_log
+        self._create_lock = threading.Lock()
+        # Sheet rows of the log entries as of the last log_count(), for the
+        # read_logs_since() that follows it
+        self._dated = None
+        self._stash = {}
+        self._stash_lock = threading.Lock()
+
+    def _call(self, key, fn, wait=True):
+        if self._create_log:
+            self._ensure_log(wait)
+        return self.coordinator.run(key, fn, wait=wait)
+
+    def _ensure_log(self, wait):
+        # Reads of a missing worksheet fail the whole batch, so the log is
+        # created before the first request of any kind. That request is on
+        # a background load when bootstrapping, so first paint doesn't wait
+        # on it; a failure just fails that request and the next one retries.
+        def ensure():
+            if self.worksheet not in self.client.worksheet_titles():
+                self.client.worksheet(self.worksheet, cols=len(LOG_COLUMNS)).append_rows([LOG_COLUMNS])
+        with self._create_lock:
+            if self._create_log:
+                self.coordinator.run(None, ensure, wait=wait)
+                self._create_log = False
+
+    def _sheet(self):
+        # gspread Worksheet for writes, opened once
+        return self.client.worksheet(self.worksheet)
+
+    def _column(self, cells):
+        return self.client.values([a1(self.worksheet, cells)])[0]
+
+    def _fetch(self, parts):
+        # {part: frame} for 'movements', 'logs' and/or 'summary' in one batchGet
+        ranges = {
+            'movements': a1(self.bank_worksheet, "A:E"),
+            'logs': a1(self.worksheet, "A:E"),
+            'summary': a1(self.summary_worksheet, "A:Z"),
+        }
+        asked = [p for p in parts if p != 'summary' or self._has_summary is not False]
+        try:
+            values = self.client.values([ranges[p] for p in asked]) if asked else []
+        except requests.HTTPError as e:
+            # A missing worksheet fails the whole batch: fetch without the
+            # summary and don't ask for it again until we write one
+            if 'summary' not in asked or e.response is None or e.response.status_code != 400:
+                raise
+            self._has_summary = False
+            return self._fetch(parts)
+        if 'summary' in asked:
+            self._has_summary = True
+        frames = dict.fromkeys(parts)
+        for part, rows in zip(asked, values):
+            if part == 'movements':
+                frames[part] = _rows_frame(rows, MOVEMENT_COLUMNS)
+            elif part == 'logs':
+                frames[part] = _log_frame(rows)
+            else:
+                frames[part] = _summary_frame(rows)
+        return frames
+
+    def _read(self, want):
+        with self._stash_lock:
+            kept = self._stash.pop(want, None)
+        if kept and time.monotonic() - kept[0] < self.STASH_SECONDS:
+            return kept[1]
+        if self._warm:
+            return self._call(("read", want), lambda: self._fetch([want]))[want]
+        frames = self._call("all", lambda: self._fetch(['movements', 'logs', 'summary']))
+        self._warm = True
+        with self._stash_lock:
+            for other, frame in frames.items():
+                if other != want:
+                    self._stash[other] = (time.monotonic(), frame)
+        return frames[want]
+
+    def _written(self, part='logs'):
+        # A kept copy is older than our own write now
+        with self._stash_lock:
+            self._stash.pop(part, None)
+
+    def read_movements(self):
+        return self._read('movements')
+
+    def read_logs(self):
+        return self._read('logs')
+
+    def log_count(self):
+        # A single column fetch instead of the whole sheet. Only a freshness
+        # check, so it gives way when the budget is spent.
+        def count():
+            self._dated = _dated_rows(self._column("A:A"))
+            return len(self._dated)
+        return self._call("count", count, wait=False)
+
+    def read_logs_since(self, n):
+        # Blank rows don't count as entries, so entry n+1 starts after the
+        # sheet row of entry n (from the count just before, or refetched).
+        # A freshness read like log_count(): gives way when over budget.
+        def since():
+            dated, self._dated = self._dated, None
+            if n and (dated is None or len(dated) < n):
+                dated = _dated_rows(self._column("A:A"))
+            if len(dated or []) < n:
+                return []  # Shrank meanwhile; the next count reloads
+            return self._column(f"A{dated[n - 1] + 1 if n else 2}:E")
+        values = self._call(("since", n), since, wait=False)
+        return _log_frame([LOG_COLUMNS] + values)
+
+    def append_logs(self, rows):
+        # Only the new rows go over the wire; the sheet appends them after
+        # the last filled row, so concurrent saves can't clobber each other.
+        if rows:
+            self._written()
+            self._call(None, lambda: self._sheet().append_rows(rows_to_values(rows), value_input_option="USER_ENTERED"))
+
+    def replace_logs(self, df):
+        self._written()
+        self._call(None, lambda: self.conn.update(spreadsheet=self.spreadsheet, worksheet=self.worksheet, data=df[LOG_COLUMNS]))
+
+    def _row_of(self, log_id):
+        # Resolve the ID to its current sheet row at write time, fetching
+        # only the ID column
+        try:
+            return [r[0] if r else "" for r in self._column("E:E")].index(log_id) + 1
+        except ValueError:
+            raise KeyError(f"Log entry {log_id} no longer exists") from None
+
+    def update_log(self, log_id, weight, reps):
+        def update():
+            row = self._row_of(log_id)
+            self._sheet().update(range_name=f"C{row}:D{row}", values=[[weight, reps]], value_input_option="USER_ENTERED")
+        self._written()
+        self._call(None, update)
+
+    def delete_log(self, log_id):
+        def delete():
+            self._sheet().delete_rows(self._row_of(log_id))
+        self._written()
+        self._call(None, delete)
+
+    def existing_ids(self, ids):
+        values = self._call("ids", lambda: self._column("E:E"))
+        return {r[0] for r in values if r} & set(ids)
+
+    def backfill_ids(self):
+        self._written()
+        self._call(None, self._backfill_ids)
+
+    def _backfill_ids(self):
+        first, ids = self.client.values([a1(self.worksheet, "A:A"), a1(self.worksheet, "E:E")])
+        dated = _dated_rows(first)
+        ids = [r[0] if r else "" for r in ids]
+        ids += [""] * (len(first) - len(ids))
+        if all(ids[row - 1] for row in dated):
+            return
+        # Blank rows stay blank
+        for row in dated:
+            ids[row - 1] = ids[row - 1] or new_log_id()
+        column = [["ID"]] + [[i] for i in ids[1:len(first)]]
+        self._sheet().update(range_name=f"E1:E{len(first)}", values=column)
+
+    # --- archive ---
+    def _partition_title(self, year):
+        return f"{self.worksheet}_{year}"
+
+    def partitions(self):
+        pattern = re.compile(re.escape(self.worksheet) + r"_(\d{4})$")
+        titles = self._call("titles", self.client.worksheet_titles)
+        return sorted(int(m.group(1)) for m in map(pattern.match, titles) if m)
+
+    def read_partition(self, year):
+        title = self._partition_title(year)
+        return _log_frame(self._call(("partition", year), lambda: self.client.values([a1(title, "A:E")])[0]))
+
+    def read_summary(self):
+        return self._read('summary')
+
+    def write_partition(self, year, df):
+        title = self._partition_title(year)
+        sheet = self._call(None, lambda: self.client.worksheet(title, cols=len(LOG_COLUMNS)))
+        have = self._call(None, lambda: self.client.values([a1(title, "E:E")])[0])
+        new = df[~df['ID'].isin({r[0] for r in have if r})]
+        values = ([] if have else [LOG_COLUMNS]) + frame_values(new[LOG_COLUMNS])
+        if values:
+            self._call(None, lambda: sheet.append_rows(values, value_input_option="USER_ENTERED"))
+
+    def drop_oldest(self, ids):
+        # Archived rows are the first entries under the header; blank rows
+        # among them go too
+        def drop():
+            first, column = self.client.values([a1(self.worksheet, "A:A"), a1(self.worksheet, "E:E")])
+            rows = _dated_rows(first)[:len(ids)]
+            found = [column[r - 1][0] if r <= len(column) and column[r - 1] else None for r in rows]
+            _check_oldest(found, ids)
+            self._sheet().delete_rows(2, rows[-1])
+        if ids:
+            self._written()
+            self._call(None, drop)
+
+    def write_summary(self, df):
+        def write():
+            sheet = self.client.worksheet(self.summary_worksheet, cols=len(df.columns))
+            # Values updates don't grow the grid (a new sheet has one row):
+            # size it to the summary, which also drops rows left from a
+            # longer one
+            sheet.resize(rows=len(df) + 1, cols=len(df.columns))
+            sheet.update(range_name="A1", values=[list(df.columns)] + frame_values(df))
+        self._written('summary')
+        self._call(None, write)
+        self._has_summary = True
+
+
+# --- LOCAL SQLITE ---
+class SqliteStore(Store):
+    def __init__(self, path, bank_csv=BANK_CSV):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date TEXT NOT NULL,
+                    exercise TEXT NOT NULL,
+                    weight REAL,
+                    reps INTEGER,
+                    log_id TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_logs_exercise_date ON logs (exercise, date);
+                CREATE TABLE IF NOT EXISTS movements (
+                    position INTEGER PRIMARY KEY,
+                    day TEXT, target_group TEXT, status TEXT, exercise TEXT, video_link TEXT
+                );
+                -- Archived years (see archive.py); the summary table is
+                -- written by pandas on the first archive run
+                CREATE TABLE IF NOT EXISTS logs_archive (
+                    year INTEGER NOT NULL,
+                    date TEXT NOT NULL,
+                    exercise TEXT NOT NULL,
+                    weight REAL,
+                    reps INTEGER,
+                    log_id TEXT PRIMARY KEY
+                );
+                CREATE INDEX IF NOT EXISTS idx_logs_archive_year ON logs_archive (year, date);
+            """)
+            # Databases created before stable IDs
+            if "log_id" not in [c[1] for c in db.execute("PRAGMA table_info(logs)")]:
+                db.execute("ALTER TABLE logs ADD COLUMN log_id TEXT")
+            db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_logs_log_id ON logs (log_id)")
+            # Seed the exercise bank from the bundled CSV on first run
+            empty = db.execute("SELECT COUNT(*) FROM movements").fetchone()[0] == 0
+            if empty and bank_csv and os.path.exists(bank_csv):
+                bank = pd.read_csv(bank_csv)
+                db.executemany(
+                    "INSERT INTO movements (day, target_group, status, exercise, video_link) VALUES (?, ?, ?, ?, ?)",
+                    bank[MOVEMENT_COLUMNS].astype(object).where(bank[MOVEMENT_COLUMNS].notna(), None).values.tolist(),
+                )
+
+    def _connect(self):
+        return sqlite_transaction(self.path)
+
+    def read_movements(self):
+        with self._connect() as db:
+            return pd.read_sql_query(
+                'SELECT day AS "Day", target_group AS "Target Group", status AS "Status", '
+                'exercise AS "Exercise", video_link AS "Video Link" FROM movements ORDER BY position',
+                db,
+            )
+
+    def read_logs(self):
+        with self._connect() as db:
+            df = pd.read_sql_query(
+                'SELECT date AS "Date", exercise AS "Exercise", weight AS "Weight", reps AS "Reps", log_id AS "ID" '
+                'FROM logs ORDER BY logs.id',
+                db,
+            )
+        if df.empty:
+            return empty_logs()
+        return df
+
+    def log_count(self):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+
+    def read_logs_since(self, n):
+        with self._connect() as db:
+            return pd.read_sql_query(
+                'SELECT date AS "Date", exercise AS "Exercise", weight AS "Weight", reps AS "Reps", log_id AS "ID" '
+                'FROM logs ORDER BY logs.id LIMIT -1 OFFSET ?',
+                db,
+                params=(n,),
+            )
+
+    def append_logs(self, rows):
+        if not rows:
+            return
+        with self._connect() as db:
+            db.executemany("INSERT INTO logs (date, exercise, weight, reps, log_id) VALUES (?, ?, ?, ?, ?)", rows_to_values(rows))
+
+    def replace_logs(self, df):
+        values = df[LOG_COLUMNS].astype(object).where(df[LOG_COLUMNS].notna(), None)
+        values['Date'] = values['Date'].astype(str)
+        with self._connect() as db:
+            db.execute("DELETE FROM logs")
+            db.executemany("INSERT INTO logs (date, exercise, weight, reps, log_id) VALUES (?, ?, ?, ?, ?)", values.values.tolist())
+
+    def update_log(self, log_id, weight, reps):
+        with self._connect() as db:
+            if db.execute("UPDATE logs SET weight = ?, reps = ? WHERE log_id = ?", (weight, reps, log_id)).rowcount == 0:
+                raise KeyError(f"Log entry {log_id} no longer exists")
+
+    def delete_log(self, log_id):
+        with self._connect() as db:
+            if db.execute("DELETE FROM logs WHERE log_id = ?", (log_id,)).rowcount == 0:
+                raise KeyError(f"Log entry {log_id} no longer exists")
+
+    def existing_ids(self, ids):
+        ids = list(ids)
+        with self._connect() as db:
+            marks = ", ".join("?" * len(ids))
+            return {r[0] for r in db.execute(f"SELECT log_id FROM logs WHERE log_id IN ({marks})", ids)}
+
+    def backfill_ids(self):
+        with self._connect() as db:
+            missing = [r[0] for r in db.execute("SELECT id FROM logs WHERE log_id IS NULL")]
+            db.executemany("UPDATE logs SET log_id = ? WHERE id = ?", [(new_log_id(), i) for i in missing])
+
+    # --- archive ---
+    def partitions(self):
+        with self._connect() as db:
+            return [r[0] for r in db.execute("SELECT DISTINCT year FROM logs_archive ORDER BY year")]
+
+    def read_partition(self, year):
+        with self._connect() as db:
+            df = pd.read_sql_query(
+                'SELECT date AS "Date", exercise AS "Exercise", weight AS "Weight", reps AS "Reps", log_id AS "ID" '
+                'FROM logs_archive WHERE year = ? ORDER BY date, rowid',
+                db,
+                params=(year,),
+            )
+        return empty_logs() if df.empty else df
+
+    def write_partition(self, year, df):
+        values = [[year] + row for row in frame_values(df[LOG_COLUMNS])]
+        with self._connect() as db:
+            db.executemany(
+                "INSERT OR IGNORE INTO logs_archive (year, date, exercise, weight, reps, log_id) VALUES (?, ?, ?, ?, ?, ?)", values
+            )
+
+    def drop_oldest(self, ids):
+        with self._connect() as db:
+            oldest = db.execute("SELECT id, log_id FROM logs ORDER BY id LIMIT ?", (len(ids),)).fetchall()
+            _check_oldest([r[1] for r in oldest], ids)
+            db.executemany("DELETE FROM logs WHERE id = ?", [(r[0],) for r in oldest])
+
+    def read_summary(self):
+        with self._connect() as db:
+            if db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'log_summary'").fetchone():
+                return pd.read_sql_query("SELECT * FROM log_summary", db)
+        return None
+
+    def write_summary(self, df):
+        with self._connect() as db:
+            df.to_sql("log_summary", db, if_exists="replace", index=False)
+
+
+# --- LOCAL CSV ---
+class CsvStore(Store):
+    # Whole-file rewrites (edits, deletes, archival) and appends from the
+    # journal flusher share the log file, so they take turns on a lock, and
+    # rewrites go through a temporary file so readers never see half of one.
+    def __init__(self, path, bank_csv=BANK_CSV):
+        self.path = path
+        self.bank_csv = bank_csv
+        self._lock = threading.RLock()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # Rewrite files from before the ID column so appends line up
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path) as f:
+                if "ID" not in f.readline().strip().split(","):
+                    self.backfill_ids()
+
+    def read_movements(self):
+        return pd.read_csv(self.bank_csv)
+
+    def read_logs(self):
+        if not os.path.exists(self.path):
+            return empty_logs()
+        df = pd.read_csv(self.path)
+        if df.empty:
+            return empty_logs()
+        return with_log_columns(df)
+
+    def append_logs(self, rows):
+        if not rows:
+            return
+        with self._lock:
+            write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            pd.DataFrame(rows, columns=LOG_COLUMNS).to_csv(self.path, mode="a", header=write_header, index=False)
+
+    def _write(self, df, path):
+        tmp = path + ".tmp"
+        df.to_csv(tmp, index=False)
+        os.replace(tmp, path)
+
+    def replace_logs(self, df):
+        with self._lock:
+            self._write(df[LOG_COLUMNS], self.path)
+
+    # Read-modify-write under the lock, so a concurrent append isn't lost
+    def update_log(self, log_id, weight, reps):
+        with self._lock:
+            super().update_log(log_id, weight, reps)
+
+    def delete_log(self, log_id):
+        with self._lock:
+            super().delete_log(log_id)
+
+    def backfill_ids(self):
+        with self._lock:
+            super().backfill_ids()
+
+    # --- archive: logs_2024.csv etc. and logs_summary.csv next to the log ---
+    def _partition_path(self, year):
+        return f"{os.path.splitext(self.path)[0]}_{year}.csv"
+
+    def _summary_path(self):
+        return f"{os.path.splitext(self.path)[0]}_summary.csv"
+
+    def partitions(self):
+        folder = os.path.dirname(self.path) or "."
+        pattern = re.compile(re.escape(os.path.splitext(os.path.basename(self.path))[0]) + r"_(\d{4})\.csv$")
+        return sorted(int(m.group(1)) for m in map(pattern.match, os.listdir(folder)) if m)
+
+    def read_partition(self, year):
+        path = self._partition_path(year)
+        return with_log_columns(pd.read_csv(path)) if os.path.exists(path) else empty_logs()
+
+    def write_partition(self, year, df):
+        with self._lock:
+            have = self.read_partition(year)
+            new = df[~df['ID'].isin(set(have['ID']))]
+            if len(new):
+                rows = new[LOG_COLUMNS] if have.empty else pd.concat([have, new[LOG_COLUMNS]], ignore_index=True)
+                self._write(rows, self._partition_path(year))
+
+    def drop_oldest(self, ids):
+        with self._lock:
+            df = self.read_logs()
+            _check_oldest(df['ID'].iloc[:len(ids)], ids)
+            self.replace_logs(df.iloc[len(ids):])
+
+    def read_summary(self):
+        path = self._summary_path()
+        return pd.read_csv(path, float_precision="round_trip") if os.path.exists(path) else None
+
+    def write_summary(self, df):
+        with self._lock:
+            self._write(df, self._summary_path())
+
+
+def user_data_dir(data_dir, user=None):
+    return os.path.join(data_dir, "users", user) if user else data_dir
+
+
+def make_store(kind, data_dir=".pippafit", conn=None, spreadsheet=None, coordinator=None, user=None):
+    # user=None is the original single-athlete log; any other athlete ID
+    # gets its own database/CSV folder or Logs_<user> worksheets. The
+    # exercise bank is shared.
+    data_dir = user_data_dir(data_dir, user)
+    if kind == "sqlite":
+        return SqliteStore(os.path.join(data_dir, "pippafit.db"))
+    if kind == "csv":
+        return CsvStore(os.path.join(data_dir, "logs.csv"))
+    if kind == "gsheets":
+        suffix = f"_{user}" if user else ""
+        return GSheetsStore(conn, spreadsheet, worksheet=f"Logs{suffix}", summary_worksheet=f"Log_summary{suffix}",
+                            coordinator=coordinator, create_log=bool(user))
+    raise ValueError(f"Unknown storage backend: {kind}")
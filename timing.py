@@ -0,0 +1,74 @@
+"""Lightweight per-stage timing for app.py.
+
+stage() times a block, keeps the last few hundred samples per stage in
+memory (process-wide, shared by all sessions) and writes one JSON line per
+sample to the "pippafit.timing" logger. summary() turns the samples into
+p50/p95 rows for the diagnostics panel; count() tracks cache hits/misses.
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("pippafit.timing")
+
+_samples = defaultdict(lambda: deque(maxlen=500))
+_counts = defaultdict(lambda: {'hit': 0, 'miss': 0})
+_lock = threading.Lock()
+
+
+def configure(path=None):
+    # JSON lines to a file if asked, otherwise whatever logging is set up
+    if path and not logger.handlers:
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+
+def record(name, seconds, **fields):
+    with _lock:
+        _samples[name].append(seconds)
+    logger.info(json.dumps({'ts': time.time(), 'stage': name, 'ms': round(seconds * 1000, 2), **fields}))
+
+
+@contextmanager
+def stage(name, **fields):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        # Also records blocks cut short by st.rerun()/st.stop()
+        record(name, time.perf_counter() - start, **fields)
+
+
+def count(name, hit):
+    with _lock:
+        _counts[name]['hit' if hit else 'miss'] += 1
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _counts.clear()
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summary():
+    with _lock:
+        samples = {name: list(values) for name, values in _samples.items()}
+        counts = {name: dict(c) for name, c in _counts.items()}
+    stages = [
+        {'Stage': name, 'Runs': len(values),
+         'p50 ms': _percentile(values, 0.5) * 1000, 'p95 ms': _percentile(values, 0.95) * 1000,
+         'max ms': max(values) * 1000}
+        for name, values in sorted(samples.items()) if values
+    ]
+    caches = [{'Cache': name, 'Hits': c['hit'], 'Misses': c['miss']} for name, c in sorted(counts.items())]
+    return stages, caches